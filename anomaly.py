@@ -0,0 +1,228 @@
+import json
+import math
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import storage
+from fx import BASE_CURRENCY, format_money
+
+# Spending is flagged when it is this many standard deviations above the
+# running mean of its group, once the group has enough history
+Z_THRESHOLD = 3.0
+MIN_SAMPLES = 10
+# Only spending this recent is reported on the Dashboard
+ALERT_DAYS = 7
+PERIODS = ("daily", "weekly")
+
+
+def stats_file(username):
+    return os.path.join(storage.user_data_dir(username), "anomaly_stats.json")
+
+
+# Running statistics are [count, mean, M2] lists so they serialize as JSON
+
+def welford_add(stats, x):
+    stats[0] += 1
+    delta = x - stats[1]
+    stats[1] += delta / stats[0]
+    stats[2] += delta * (x - stats[1])
+
+
+def welford_remove(stats, x):
+    if stats[0] <= 1:
+        stats[:] = [0, 0.0, 0.0]
+        return
+    delta = x - stats[1]
+    stats[0] -= 1
+    stats[1] -= delta / stats[0]
+    stats[2] = max(stats[2] - delta * (x - stats[1]), 0.0)
+
+
+def z_score(stats, x):
+    """Standard score of x, or None while the group has too little history"""
+    count, mean, m2 = stats
+    if count < MIN_SAMPLES or m2 <= 0:
+        return None
+    return (x - mean) / math.sqrt(m2 / count)
+
+
+def week_start(day):
+    """Monday of the week containing a YYYY-MM-DD date"""
+    day = date.fromisoformat(day)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def period_key(day, period):
+    return day if period == "daily" else week_start(day)
+
+
+def empty_stats():
+    return {"digests": {}, "transactions": {}, "daily": {}, "weekly": {}}
+
+
+def add_to_period(entry, key, amount):
+    """Add spending to a period total in O(1).
+
+    The latest period is still filling up, so only earlier periods are
+    part of the running statistics.
+    """
+    totals, stats = entry["totals"], entry["stats"]
+    latest = entry["latest"]
+    if key == latest:
+        totals[key] += amount
+    elif key > latest:
+        welford_add(stats, totals[latest])
+        entry["latest"] = key
+        totals[key] = amount
+    elif key in totals:
+        welford_remove(stats, totals[key])
+        totals[key] += amount
+        welford_add(stats, totals[key])
+    else:
+        totals[key] = amount
+        welford_add(stats, amount)
+
+
+def add_transaction(stats, t):
+    """Fold one new transaction into the running statistics"""
+    if t['type'] != 'Expense':
+        return
+    currency = t.get('currency', BASE_CURRENCY)
+    group = stats["transactions"].setdefault(f"{t['category']}|{currency}", [0, 0.0, 0.0])
+    welford_add(group, t['amount'])
+    for period in PERIODS:
+        key = period_key(t['date'], period)
+        entry = stats[period].get(currency)
+        if entry is None:
+            stats[period][currency] = {"latest": key, "totals": {key: t['amount']}, "stats": [0, 0.0, 0.0]}
+        else:
+            add_to_period(entry, key, t['amount'])
+
+
+def backfill(df):
+    """Statistics for a whole transaction frame, computed with group-bys"""
+    stats = empty_stats()
+    expenses = df[df['type'] == 'Expense']
+    if expenses.empty:
+        return stats
+
+    amounts = expenses['amount'].astype(float)
+    groups = amounts.groupby([expenses['category'], expenses['currency']]).agg(['count', 'mean', 'var'])
+    for (category, currency), row in groups.iterrows():
+        stats["transactions"][f"{category}|{currency}"] = group_stats(row)
+
+    days = pd.to_datetime(expenses['date'], format="%Y-%m-%d")
+    keys = {
+        "daily": expenses['date'],
+        "weekly": (days - pd.to_timedelta(days.dt.weekday, unit='D')).dt.strftime("%Y-%m-%d"),
+    }
+    for period in PERIODS:
+        totals = amounts.groupby([expenses['currency'], keys[period].rename('period')]).sum().reset_index()
+        latest = totals.groupby('currency')['period'].transform('max')
+        closed = totals[totals['period'] != latest].groupby('currency')['amount'].agg(['count', 'mean', 'var'])
+        for currency, group in totals.groupby('currency'):
+            stats[period][currency] = {
+                "latest": group['period'].max(),
+                "totals": dict(zip(group['period'], group['amount'].astype(float))),
+                "stats": group_stats(closed.loc[currency]) if currency in closed.index else [0, 0.0, 0.0],
+            }
+    return stats
+
+
+def group_stats(row):
+    """[count, mean, M2] from a count/mean/var aggregate row"""
+    count = int(row['count'])
+    variance = 0.0 if count < 2 or pd.isna(row['var']) else float(row['var'])
+    return [count, float(row['mean']), variance * (count - 1)]
+
+
+def current_digests(manifest):
+    return {key: summary.get("digest") for key, summary in manifest["partitions"].items()}
+
+
+def refresh_stats(username, manifest, stats=None):
+    """Spending statistics matching the stored partitions.
+
+    Statistics are persisted with the partition digests they were built
+    from. Stale statistics are re-read from the file, which the ingestion
+    endpoint keeps current, and only backfilled from the full history when
+    that differs too.
+    """
+    digests = current_digests(manifest)
+    if stats is not None and stats["digests"] == digests:
+        return stats
+    path = stats_file(username)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            stats = json.load(f)
+        if stats["digests"] == digests:
+            return stats
+    stats = backfill(storage.partitions_frame(username, manifest, manifest["partitions"]))
+    stats["digests"] = digests
+    storage.write_json(stats_file(username), stats, indent=None)
+    return stats
+
+
+def record_transaction(username, manifest, stats, t):
+    """Update statistics that were current before t was saved"""
+    add_transaction(stats, t)
+    stats["digests"] = current_digests(manifest)
+    storage.write_json(stats_file(username), stats, indent=None)
+
+
+def record_transactions(username, previous, manifest, transactions):
+    """Fold new transactions into the stored statistics.
+
+    Only done when the file matched the previous partition digests,
+    otherwise it is left for refresh_stats to backfill.
+    """
+    path = stats_file(username)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        stats = json.load(f)
+    if stats["digests"] != previous:
+        return
+    for t in transactions:
+        add_transaction(stats, t)
+    stats["digests"] = current_digests(manifest)
+    storage.write_json(path, stats, indent=None)
+
+
+def spending_alerts(stats, transactions, today=None):
+    """Recent transactions and daily or weekly totals that stand out.
+
+    Returns dicts with a z score and a message, most unusual first.
+    """
+    today = today or datetime.now().date()
+    since = (today - timedelta(days=ALERT_DAYS)).isoformat()
+    alerts = []
+
+    for t in transactions:
+        if t['type'] != 'Expense' or t['date'] < since:
+            continue
+        currency = t.get('currency', BASE_CURRENCY)
+        group = stats["transactions"].get(f"{t['category']}|{currency}")
+        z = z_score(group, t['amount']) if group else None
+        if z is not None and z >= Z_THRESHOLD:
+            alerts.append({"z": z, "message": (
+                f"{t['description'] or t['category']} on {t['date']}: {format_money(t['amount'], currency)} "
+                f"is unusually large for {t['category']} (typically {format_money(group[1], currency)})"
+            )})
+
+    labels = {"daily": "Spending on", "weekly": "Spending in the week of"}
+    for period in PERIODS:
+        start = period_key(since, period)
+        for currency, entry in stats[period].items():
+            for key, total in entry["totals"].items():
+                z = z_score(entry["stats"], total) if key >= start else None
+                if z is not None and z >= Z_THRESHOLD:
+                    typical = "day" if period == "daily" else "week"
+                    alerts.append({"z": z, "message": (
+                        f"{labels[period]} {key}: {format_money(total, currency)} "
+                        f"against a typical {typical} of {format_money(entry['stats'][1], currency)}"
+                    )})
+
+    return sorted(alerts, key=lambda alert: alert["z"], reverse=True)
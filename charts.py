@@ -0,0 +1,139 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import fx
+
+# Chart builders are pure functions so they can run in the background
+# thread pool, away from the Streamlit script thread
+
+
+def prepare_frame(df, rates, reporting):
+    """Transactions converted to the reporting currency with parsed dates"""
+    df = fx.converted_frame(df, rates, reporting)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def income_expense_figure(df):
+    daily_summary = df.groupby(['date', 'type'])['amount'].sum().reset_index()
+    pivot_df = daily_summary.pivot(index='date', columns='type', values='amount').fillna(0)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=pivot_df.index, y=pivot_df.get('Income', [0]*len(pivot_df)),
+        mode='lines+markers', name='Income',
+        line=dict(color='#4facfe', width=3),
+        fill='tozeroy'
+    ))
+    fig.add_trace(go.Scatter(
+        x=pivot_df.index, y=pivot_df.get('Expense', [0]*len(pivot_df)),
+        mode='lines+markers', name='Expenses',
+        line=dict(color='#f5576c', width=3),
+        fill='tozeroy'
+    ))
+    fig.update_layout(
+        height=400,
+        template='plotly_white',
+        hovermode='x unified',
+        margin=dict(l=20, r=20, t=30, b=20)
+    )
+    return fig
+
+
+def expense_breakdown_figure(expense_totals):
+    if not expense_totals:
+        return None
+    category_expenses = pd.DataFrame([
+        {'category': category, 'amount': total['amount']}
+        for category, total in expense_totals.items()
+    ])
+    fig = px.pie(
+        category_expenses, values='amount', names='category',
+        hole=0.6, color_discrete_sequence=px.colors.sequential.Viridis
+    )
+    fig.update_layout(
+        height=400,
+        showlegend=True,
+        margin=dict(l=20, r=20, t=30, b=20)
+    )
+    return fig
+
+
+def monthly_trends_figure(df, reporting):
+    monthly_data = df.groupby(['month', 'type'])['amount'].sum().reset_index()
+    monthly_pivot = monthly_data.pivot(index='month', columns='type', values='amount').fillna(0)
+
+    fig = go.Figure()
+    if 'Income' in monthly_pivot.columns:
+        fig.add_trace(go.Bar(
+            name='Income',
+            x=monthly_pivot.index,
+            y=monthly_pivot['Income'],
+            marker_color='#4facfe'
+        ))
+    if 'Expense' in monthly_pivot.columns:
+        fig.add_trace(go.Bar(
+            name='Expenses',
+            x=monthly_pivot.index,
+            y=monthly_pivot['Expense'],
+            marker_color='#f5576c'
+        ))
+
+    fig.update_layout(
+        barmode='group',
+        height=500,
+        template='plotly_white',
+        xaxis_title="Month",
+        yaxis_title=f"Amount ({reporting})",
+        hovermode='x unified'
+    )
+    return fig
+
+
+def category_stats_table(expenses_df):
+    if expenses_df.empty:
+        return None
+    category_stats = expenses_df.groupby('category').agg({
+        'amount': ['sum', 'count']
+    }).round(2)
+    category_stats.columns = ['Total Spent', 'Transactions']
+    return category_stats.sort_values('Total Spent', ascending=False)
+
+
+def weekday_spending_figure(expenses_df, reporting):
+    if expenses_df.empty:
+        return None
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    day_spending = expenses_df.groupby(expenses_df['date'].dt.day_name())['amount'].sum().reindex(day_order).fillna(0)
+
+    fig = px.bar(
+        x=day_spending.index,
+        y=day_spending.values,
+        labels={'x': 'Day of Week', 'y': f'Total Spent ({reporting})'},
+        color=day_spending.values,
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+def dashboard_charts(df, expense_totals, rates, reporting):
+    """All Dashboard charts for the loaded transactions"""
+    df = prepare_frame(df, rates, reporting)
+    return {
+        "income_expense": income_expense_figure(df),
+        "expense_breakdown": expense_breakdown_figure(expense_totals),
+    }
+
+
+def analytics_charts(load_frame, rates, reporting):
+    """All Analytics charts and tables for the frame returned by load_frame"""
+    df = prepare_frame(load_frame(), rates, reporting)
+    df['month'] = df['date'].dt.strftime('%Y-%m')
+    expenses_df = df[df['type'] == 'Expense']
+    return {
+        "monthly_trends": monthly_trends_figure(df, reporting),
+        "category_stats": category_stats_table(expenses_df),
+        "weekday_spending": weekday_spending_figure(expenses_df, reporting),
+    }
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+# Two transactions are duplicates when type, currency and normalized
+# description match and date and amount fall within these windows
+DATE_WINDOW_DAYS = 2
+AMOUNT_WINDOW_CENTS = 1
+# Neighbours compared per row by the whole-ledger scan
+SCAN_NEIGHBOURS = 8
+
+
+def index_dir(username):
+    return os.path.join(storage.user_data_dir(username), "fingerprints")
+
+
+def index_file(username, key):
+    """Fingerprints of one YYYY-MM partition"""
+    return os.path.join(index_dir(username), f"{key}.json")
+
+
+def normalize_description(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def identity(t):
+    """Short hash of the non-fuzzy fingerprint fields"""
+    text = f"{t['type']}|{t.get('currency', '')}|{normalize_description(t['description'])}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint(day, cents, ident):
+    return f"{day}|{cents}|{ident}"
+
+
+def transaction_fingerprint(t):
+    return fingerprint(t['date'], int(round(t['amount'] * 100)), identity(t))
+
+
+def empty_index():
+    # Fingerprints start with the date, so they are kept per partition
+    return {"partitions": {}, "entries": {}}
+
+
+def add_to_index(index, t):
+    entries = index["entries"].setdefault(storage.partition_key(t['date']), {})
+    entries.setdefault(transaction_fingerprint(t), []).append(t['id'])
+
+
+def find_duplicate(index, t):
+    """Id of an indexed transaction matching t within the fuzzy window, or None.
+
+    Probes the (2 * DATE_WINDOW_DAYS + 1) * (2 * AMOUNT_WINDOW_CENTS + 1)
+    neighbouring fingerprints, so each lookup is constant time.
+    """
+    day = date.fromisoformat(t['date'])
+    cents = int(round(t['amount'] * 100))
+    ident = identity(t)
+    for day_offset in range(-DATE_WINDOW_DAYS, DATE_WINDOW_DAYS + 1):
+        probe_day = (day + timedelta(days=day_offset)).isoformat()
+        for cents_offset in range(-AMOUNT_WINDOW_CENTS, AMOUNT_WINDOW_CENTS + 1):
+            entries = index["entries"].get(storage.partition_key(probe_day), {})
+            ids = entries.get(fingerprint(probe_day, cents + cents_offset, ident))
+            if ids:
+                return ids[0]
+    return None
+
+
+def read_partition_index(username, key):
+    """Stored {"digest", "entries"} of one partition, or None"""
+    path = index_file(username, key)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_index(username):
+    """Fingerprint index from the per-partition files"""
+    index = empty_index()
+    directory = index_dir(username)
+    if not os.path.isdir(directory):
+        return index
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        key = name[:-len(".json")]
+        stored = read_partition_index(username, key)
+        index["partitions"][key] = stored["digest"]
+        index["entries"][key] = stored["entries"]
+    return index
+
+
+def refresh_index(username, manifest, index=None):
+    """Bring a user's fingerprint index in line with the stored partitions.
+
+    Stale partitions take the stored index file when another writer kept it
+    current, otherwise they are re-read and only their files rewritten.
+    """
+    if index is None:
+        index = load_index(username)
+    current = {key: summary.get("digest") for key, summary in manifest["partitions"].items()}
+    stale = {key for key in set(current) | set(index["partitions"])
+             if current.get(key) is None or index["partitions"].get(key) != current.get(key)}
+    if not stale:
+        return index
+    rebuild = set()
+    for key in stale:
+        index["partitions"].pop(key, None)
+        index["entries"].pop(key, None)
+        stored = read_partition_index(username, key) if current.get(key) is not None else None
+        if stored is not None and stored["digest"] == current[key]:
+            index["partitions"][key] = current[key]
+            index["entries"][key] = stored["entries"]
+        elif current.get(key) is not None:
+            rebuild.add(key)
+    for t in storage.load_partitions(username, manifest, rebuild):
+        add_to_index(index, t)
+    os.makedirs(index_dir(username), exist_ok=True)
+    for key in stale - rebuild:
+        if current.get(key) is None and os.path.exists(index_file(username, key)):
+            os.remove(index_file(username, key))
+    for key in rebuild:
+        index["partitions"][key] = current[key]
+        entries = index["entries"].setdefault(key, {})
+        storage.write_json(index_file(username, key), {"digest": current[key], "entries": entries}, indent=None)
+    return index
+
+
+def update_partition_index(username, key, previous, current, added=(), rows=None):
+    """Bring one stored index file up to date after its partition changed.
+
+    With rows the file is rebuilt from them. Otherwise the added rows are
+    indexed, but only when the file matched the previous digest, so a stale
+    file is left for refresh_index. A partition that is gone has current None.
+    """
+    path = index_file(username, key)
+    if current is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    index = empty_index()
+    if rows is None:
+        stored = read_partition_index(username, key) or {"digest": None, "entries": {}}
+        if stored["digest"] != previous:
+            return
+        index["entries"][key] = stored["entries"]
+    for t in added if rows is None else rows:
+        add_to_index(index, t)
+    os.makedirs(index_dir(username), exist_ok=True)
+    storage.write_json(path, {"digest": current, "entries": index["entries"].get(key, {})}, indent=None)
+
+
+def scan_duplicates(df):
+    """Find likely duplicates in a transaction frame without pairwise comparison.
+
+    Rows are sorted by fingerprint identity and date, then each row is
+    compared with its SCAN_NEIGHBOURS predecessors in vectorized passes.
+    Returns a frame with the duplicate row and the earlier row it matches.
+    """
+    columns = ['id', 'duplicate_of', 'date', 'amount', 'type', 'description', 'currency']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    descriptions = (df['description'].astype(str).str.lower()
+                    .str.replace(r"[^\w\s]", " ", regex=True)
+                    .str.split().str.join(" "))
+    keys = pd.DataFrame({
+        'ident': pd.factorize(df['type'].astype(str) + "|" + df['currency'].astype(str) + "|" + descriptions)[0],
+        'day': pd.to_datetime(df['date'], format="%Y-%m-%d").to_numpy().astype('datetime64[D]').astype(np.int64),
+        'cents': np.round(df['amount'].to_numpy(dtype=float) * 100).astype(np.int64),
+        'row': np.arange(len(df)),
+    }).sort_values(['ident', 'day', 'cents'], kind='stable')
+    ident = keys['ident'].to_numpy()
+    day = keys['day'].to_numpy()
+    cents = keys['cents'].to_numpy()
+    row = keys['row'].to_numpy()
+
+    duplicate_of = np.full(len(df), -1)
+    for shift in range(1, SCAN_NEIGHBOURS + 1):
+        if shift >= len(df):
+            break
+        match = (
+            (ident[shift:] == ident[:-shift]) &
+            (day[shift:] - day[:-shift] <= DATE_WINDOW_DAYS) &
+            (np.abs(cents[shift:] - cents[:-shift]) <= AMOUNT_WINDOW_CENTS)
+        )
+        # Keep the closest earlier match for each row
+        later, earlier = row[shift:][match], row[:-shift][match]
+        unset = duplicate_of[later] == -1
+        duplicate_of[later[unset]] = earlier[unset]
+
+    flagged = np.flatnonzero(duplicate_of >= 0)
+    result = df.iloc[flagged].assign(duplicate_of=df['id'].to_numpy()[duplicate_of[flagged]])
+    return result[columns].reset_index(drop=True)
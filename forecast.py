@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# Monte Carlo defaults
+FORECAST_PATHS = 10_000
+FORECAST_MONTHS = 60
+
+
+def monthly_flows(monthly, today=None):
+    """Return arrays of historical monthly income and expense totals.
+
+    monthly maps YYYY-MM keys to per-type totals, as kept in the storage
+    manifest.
+    """
+    if not monthly:
+        return np.zeros(0), np.zeros(0)
+    monthly = pd.DataFrame.from_dict(monthly, orient='index').fillna(0)
+    monthly.index = pd.PeriodIndex(monthly.index, freq='M')
+    # Months without any activity still count as zero-flow months
+    monthly = monthly.reindex(
+        pd.period_range(monthly.index.min(), monthly.index.max(), freq='M'),
+        fill_value=0
+    )
+    # The running month is incomplete, drop it when there is other history
+    current = pd.Timestamp(today or pd.Timestamp.now()).to_period('M')
+    if len(monthly) > 1 and monthly.index[-1] >= current:
+        monthly = monthly[monthly.index < current]
+    income = monthly.get('Income', pd.Series(0.0, index=monthly.index))
+    expense = monthly.get('Expense', pd.Series(0.0, index=monthly.index))
+    return income.to_numpy(dtype=float), expense.to_numpy(dtype=float)
+
+
+def simulate_savings(income, expense, months, n_paths=FORECAST_PATHS, seed=0):
+    """Simulate cumulative savings paths, shape (n_paths, months)"""
+    rng = np.random.default_rng(seed)
+    sampled_income = rng.choice(income, size=(n_paths, months))
+    sampled_expense = rng.choice(expense, size=(n_paths, months))
+    return np.cumsum(sampled_income - sampled_expense, axis=1)
+
+
+def months_until(deadline, today):
+    """Whole calendar months from today to a YYYY-MM-DD deadline"""
+    deadline = pd.Timestamp(deadline)
+    return (deadline.year - today.year) * 12 + (deadline.month - today.month)
+
+
+def forecast_goals(monthly, goals, today=None, n_paths=FORECAST_PATHS,
+                   months=FORECAST_MONTHS, seed=0):
+    """Estimate, per goal, the chance of reaching target by deadline.
+
+    monthly maps YYYY-MM keys to per-type totals. Each goal is evaluated
+    as if all future monthly savings went toward it. Returns one dict per
+    goal with 'probability' (0-1) and 'completion' (median projected
+    completion date as YYYY-MM-DD, or None when most paths never reach
+    the target within the horizon). Both are None when there is no
+    history to sample from.
+    """
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    income, expense = monthly_flows(monthly, today)
+    if len(income) == 0:
+        return [{'probability': None, 'completion': None} for _ in goals]
+
+    deadlines = [months_until(goal['deadline'], today) for goal in goals]
+    horizon = max([months] + deadlines)
+    savings = simulate_savings(income, expense, horizon, n_paths, seed)
+
+    results = []
+    for goal, deadline_months in zip(goals, deadlines):
+        needed = goal['target'] - goal['current']
+        if needed <= 0:
+            results.append({'probability': 1.0, 'completion': today.strftime('%Y-%m-%d')})
+            continue
+        hit = savings >= needed
+        months_needed = np.where(hit.any(axis=1), hit.argmax(axis=1) + 1, np.inf)
+        probability = float(np.mean(months_needed <= deadline_months))
+        median_months = np.median(months_needed)
+        completion = None
+        if np.isfinite(median_months):
+            completion = (today + pd.DateOffset(months=int(np.ceil(median_months)))).strftime('%Y-%m-%d')
+        results.append({'probability': probability, 'completion': completion})
+    return results
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# FX rates file: CSV with date, currency and rate columns, where rate is
+# the value of one unit of currency in the base currency on that date
+FX_RATES_FILE = "fx_rates.csv"
+BASE_CURRENCY = "USD"
+CURRENCIES = ["USD", "EUR", "GBP", "INR", "JPY", "CAD", "AUD", "CHF", "CNY"]
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "INR": "₹", "JPY": "¥", "CNY": "¥"}
+
+
+def format_money(amount, currency=BASE_CURRENCY):
+    symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+    if amount < 0:
+        return f"-{symbol}{-amount:,.2f}"
+    return f"{symbol}{amount:,.2f}"
+
+
+def rates_version(path=FX_RATES_FILE):
+    """Modification time of the rates file, used as a cache key"""
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def load_rates(path=FX_RATES_FILE):
+    """Load the FX rate table sorted by date"""
+    if not os.path.exists(path):
+        return pd.DataFrame({
+            "date": pd.Series(dtype='datetime64[ns]'),
+            "currency": pd.Series(dtype=object),
+            "rate": pd.Series(dtype=float),
+        })
+    rates = pd.read_csv(path, usecols=["date", "currency", "rate"])
+    rates["date"] = pd.to_datetime(rates["date"], format="%Y-%m-%d").astype('datetime64[ns]')
+    rates["currency"] = rates["currency"].str.upper()
+    rates["rate"] = pd.to_numeric(rates["rate"], errors='coerce')
+    rates = rates.dropna().sort_values("date", kind='stable')
+    return rates.reset_index(drop=True)
+
+
+def base_rates(dates, currencies, rates):
+    """Rate to the base currency for each row, as of its date.
+
+    Uses the latest rate on or before the date, falling back to the
+    earliest later rate for dates before the first quote. Rows without
+    any rate for their currency get NaN.
+    """
+    currencies = np.asarray(currencies, dtype=object)
+    result = np.full(len(dates), np.nan)
+    if len(dates) and len(rates):
+        left = pd.DataFrame({
+            "date": np.asarray(dates, dtype='datetime64[ns]'),
+            "currency": currencies,
+            "row": np.arange(len(dates)),
+        }).astype({"currency": object}).sort_values("date", kind='stable')
+        # merge_asof needs both currency keys in the same dtype
+        rates = rates.assign(currency=rates["currency"].astype(object))
+        for direction in ("backward", "forward"):
+            merged = pd.merge_asof(left, rates, on="date", by="currency", direction=direction)
+            found = merged["rate"].notna().to_numpy()
+            result[merged["row"].to_numpy()[found]] = merged["rate"].to_numpy()[found]
+            left = left[~found]
+            if left.empty:
+                break
+    result[currencies == BASE_CURRENCY] = 1.0
+    return result
+
+
+def conversion_rate(source, target, rates, day=None):
+    """Value of one unit of source in target as of a day, today by default.
+
+    NaN when either currency has no usable rate.
+    """
+    day = pd.Timestamp(day) if day is not None else pd.Timestamp.now().normalize()
+    dates = np.full(2, day.to_datetime64(), dtype='datetime64[ns]')
+    source_rate, target_rate = base_rates(dates, [source, target], rates)
+    return source_rate / target_rate
+
+
+def convert(frame, rates, reporting=BASE_CURRENCY):
+    """Amounts of a transaction frame converted to the reporting currency"""
+    dates = frame["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format="%Y-%m-%d")
+    dates = dates.to_numpy(dtype='datetime64[ns]')
+    converted = frame["amount"].to_numpy(dtype=float) * base_rates(dates, frame["currency"], rates)
+    if reporting != BASE_CURRENCY:
+        # The reporting rate only depends on the date, look it up once per day
+        days, inverse = np.unique(dates, return_inverse=True)
+        reporting_rates = base_rates(days, np.full(len(days), reporting, dtype=object), rates)
+        converted = converted / reporting_rates[inverse]
+    return pd.Series(converted, index=frame.index)
+
+
+def converted_frame(df, rates, reporting=BASE_CURRENCY):
+    """Transaction frame with amounts in the reporting currency.
+
+    Rows whose currency has no usable rate are dropped.
+    """
+    df = df.assign(amount=convert(df, rates, reporting))
+    return df.dropna(subset=['amount'])
+
+
+def ledger_totals(frame, rates, reporting=BASE_CURRENCY):
+    """Full-history totals in the reporting currency.
+
+    Returns the same shapes as the storage manifest helpers: totals per
+    type, expense totals per category, per-month totals by type, plus the
+    currencies that had no usable rate and were left out.
+    """
+    frame = frame.assign(converted=convert(frame, rates, reporting))
+    missing = sorted(frame.loc[frame["converted"].isna(), "currency"].unique())
+    frame = frame.dropna(subset=["converted"])
+    frame["month"] = frame["date"].str[:7]
+    expenses = frame[frame["type"] == 'Expense'].groupby("category")["converted"].agg(['sum', 'count'])
+    monthly = frame.groupby(["month", "type"])["converted"].sum().unstack(fill_value=0)
+    return {
+        "types": frame.groupby("type")["converted"].sum().to_dict(),
+        "expense_categories": {
+            category: {"amount": row["sum"], "count": int(row["count"])}
+            for category, row in expenses.iterrows()
+        },
+        "monthly": {month: row.to_dict() for month, row in monthly.iterrows()},
+        "missing": missing,
+    }
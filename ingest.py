@@ -0,0 +1,435 @@
+"""Local HTTP/JSON ingestion endpoint for scripted transaction feeds.
+
+Usage: python ingest.py [--host 127.0.0.1] [--port 8502]
+
+    POST /users/<username>/transactions
+    Idempotency-Key: <unique key per batch>
+
+    {"operations": [
+        {"op": "insert", "transaction": {"date": "2026-10-01", "category": "Food",
+                                         "amount": 12.5, "type": "Expense",
+                                         "description": "Lunch", "currency": "EUR"}},
+        {"op": "update", "id": 42, "fields": {"amount": 13.0}},
+        {"op": "delete", "id": 43}
+    ]}
+
+Batches from all clients are queued and applied by a single writer that
+group-commits everything waiting for a user with one storage save. A
+retried batch with a known idempotency key returns the stored response
+without being applied again. Open app sessions reload within a few
+seconds of a commit.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anomaly
+import dedup
+import schema
+import storage
+from fx import BASE_CURRENCY
+
+USERS_FILE = "users.json"
+DEFAULT_PORT = 8502
+# Limits on the work accepted per request and applied per commit
+MAX_OPERATIONS = 10_000
+MAX_GROUP = 256
+# Responses of this many recent batches are kept per user for retries
+IDEMPOTENCY_KEYS = 10_000
+# Replay records store one code per operation result next to its id
+RESULT_CODES = {("insert", "inserted"): "i", ("update", "updated"): "u", ("delete", "deleted"): "d",
+                ("update", "not_found"): "U", ("delete", "not_found"): "D"}
+COMMIT_TIMEOUT_SECONDS = 30
+PATH_PATTERN = re.compile(r"^/users/([^/]+)/transactions/?$")
+
+pending = queue.Queue()
+# Per-user state owned by the writer thread
+id_locations = {}
+idempotency = {}
+idempotency_lines = {}
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def idempotency_file(username):
+    """Append-only log of replay records, one JSON line per batch"""
+    return os.path.join(storage.user_data_dir(username), "idempotency.log")
+
+
+def known_users(path=USERS_FILE):
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r') as f:
+        return set(json.load(f))
+
+
+def validate_fields(fields, partial=False):
+    """Checked and coerced transaction fields, without an id"""
+    if not isinstance(fields, dict):
+        raise ValidationError("transaction fields must be an object")
+    unknown = set(fields) - set(schema.TRANSACTION_FIELDS) - {"id"}
+    if unknown:
+        raise ValidationError(f"unknown fields: {', '.join(sorted(unknown))}")
+    if not partial:
+        missing = {"date", "category", "amount", "type"} - set(fields)
+        if missing:
+            raise ValidationError(f"missing fields: {', '.join(sorted(missing))}")
+    clean = {}
+    if "date" in fields:
+        try:
+            clean["date"] = datetime.strptime(fields["date"], schema.DATE_FORMAT).strftime(schema.DATE_FORMAT)
+        except (TypeError, ValueError):
+            raise ValidationError(f"date must be YYYY-MM-DD, got {fields['date']!r}")
+    if "amount" in fields:
+        amount = fields["amount"]
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not (0 < amount < math.inf):
+            raise ValidationError(f"amount must be a positive number, got {amount!r}")
+        clean["amount"] = float(amount)
+    if "type" in fields:
+        if fields["type"] not in schema.TRANSACTION_TYPES:
+            raise ValidationError(f"type must be one of {', '.join(schema.TRANSACTION_TYPES)}")
+        clean["type"] = fields["type"]
+    for field in ("category", "description", "currency"):
+        if field in fields and not isinstance(fields[field], str):
+            raise ValidationError(f"{field} must be a string")
+    if "category" in fields:
+        categories = {category.lower(): category for category in schema.CATEGORIES}
+        if fields["category"].strip().lower() not in categories:
+            raise ValidationError(f"category must be one of {', '.join(schema.CATEGORIES)}")
+        clean["category"] = categories[fields["category"].strip().lower()]
+    if "description" in fields:
+        clean["description"] = fields["description"]
+    if "currency" in fields:
+        if not re.fullmatch(schema.CURRENCY_PATTERN, fields["currency"].strip().upper()):
+            raise ValidationError(f"currency must be a three-letter code, got {fields['currency']!r}")
+        clean["currency"] = fields["currency"].strip().upper()
+    if not partial:
+        clean.setdefault("description", "")
+        clean.setdefault("currency", BASE_CURRENCY)
+    return clean
+
+
+def validate_operations(body):
+    """Operations of a request body, checked before they are queued"""
+    operations = body.get("operations") if isinstance(body, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError("body must hold a non-empty operations list")
+    if len(operations) > MAX_OPERATIONS:
+        raise ValidationError(f"at most {MAX_OPERATIONS} operations per batch")
+    checked = []
+    for op in operations:
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind == "insert":
+            checked.append({"op": kind, "transaction": validate_fields(op.get("transaction"))})
+        elif kind in ("update", "delete"):
+            if isinstance(op.get("id"), bool) or not isinstance(op.get("id"), int):
+                raise ValidationError(f"{kind} needs an integer id")
+            entry = {"op": kind, "id": op["id"]}
+            if kind == "update":
+                entry["fields"] = validate_fields(op.get("fields"), partial=True)
+            checked.append(entry)
+        else:
+            raise ValidationError("op must be insert, update or delete")
+    return checked
+
+
+def replay_record(key, response):
+    results = response["results"]
+    return {"key": key, "codes": "".join(RESULT_CODES[(r["op"], r["status"])] for r in results),
+            "ids": [r["id"] for r in results]}
+
+
+def replayed_response(record):
+    kinds = {code: kind for kind, code in RESULT_CODES.items()}
+    return {"results": [{"op": kinds[code][0], "id": trans_id, "status": kinds[code][1]}
+                        for code, trans_id in zip(record["codes"], record["ids"])],
+            "replayed": True}
+
+
+def load_idempotency(username):
+    if username not in idempotency:
+        records = []
+        path = idempotency_file(username)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                lines = f.read().split("\n")
+            # Drop a line left partly written when the writer stopped
+            if lines[-1]:
+                os.truncate(path, os.path.getsize(path) - len(lines[-1]))
+            records = [json.loads(line) for line in lines[:-1]]
+        idempotency[username] = {record["key"]: record for record in records[-IDEMPOTENCY_KEYS:]}
+        idempotency_lines[username] = len(records)
+    return idempotency[username]
+
+
+def save_idempotency(username, records):
+    """Append new replay records, rewriting the log once it holds twice the kept keys"""
+    seen = idempotency[username]
+    for record in records:
+        seen[record["key"]] = record
+    for stale in list(seen)[:max(len(seen) - IDEMPOTENCY_KEYS, 0)]:
+        seen.pop(stale)
+    idempotency_lines[username] += len(records)
+    if idempotency_lines[username] > 2 * IDEMPOTENCY_KEYS:
+        storage.write_text(idempotency_file(username), "".join(json.dumps(r) + "\n" for r in seen.values()))
+        idempotency_lines[username] = len(seen)
+    else:
+        with open(idempotency_file(username), 'a') as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+
+
+def locate_ids(username, manifest):
+    """Map of transaction id to partition key, rebuilt from storage"""
+    frame = storage.partitions_frame(username, manifest, manifest["partitions"])
+    id_locations[username] = dict(zip(frame['id'].astype(int), frame['date'].map(storage.partition_key)))
+    return id_locations[username]
+
+
+def commit_user(username, items):
+    """Apply queued batches of one user and save them together"""
+    # App sessions save under the same lock and refuse to save over this commit
+    with storage.user_lock(username):
+        apply_batches(username, items)
+
+
+def apply_batches(username, items):
+    """Apply batches and save them, called with the user's lock held.
+
+    Inserts, updates and deletes are appended to the partition logs, so a
+    commit writes only its own rows. Partitions are read only when an
+    update or delete needs one of their rows.
+    """
+    manifest = storage.load_manifest(username)
+    seen = load_idempotency(username)
+    locations = id_locations.get(username)
+    if locations is None:
+        locations = locate_ids(username, manifest)
+    entries = {}
+    loaded = {}
+    next_id = storage.next_transaction_id(manifest)
+    rebuilt = False
+
+    def append(key, entry):
+        entries.setdefault(key, []).append(entry)
+
+    def partition(key):
+        if key not in loaded:
+            # Rows inserted earlier in this commit are only in its entries so far
+            loaded[key] = storage.apply_entries(storage.load_partition(username, key), entries.get(key, []))
+        return loaded[key]
+
+    def find(trans_id):
+        # The app may have added or moved transactions since the map was built
+        nonlocal locations, rebuilt
+        for attempt in range(2):
+            key = locations.get(trans_id)
+            if key is not None:
+                for t in partition(key):
+                    if t['id'] == trans_id:
+                        return t
+            if rebuilt:
+                return None
+            locations = locate_ids(username, manifest)
+            # Rows inserted or moved earlier in this commit are not stored yet
+            locations.update({entry["upsert"]['id']: key for key, log in entries.items()
+                              if key not in loaded for entry in log})
+            locations.update({t['id']: key for key, rows in loaded.items() for t in rows})
+            rebuilt = True
+        return None
+
+    new_records = {}
+    for item in items:
+        key = item["key"]
+        if key is not None and (key in seen or key in new_records):
+            item["response"] = replayed_response(seen.get(key) or new_records[key])
+            continue
+        results = []
+        for op in item["operations"]:
+            if op["op"] == "insert":
+                t = dict(op["transaction"], id=next_id)
+                next_id += 1
+                month = storage.partition_key(t['date'])
+                append(month, {"upsert": t})
+                if month in loaded:
+                    loaded[month].append(t)
+                locations[t['id']] = month
+                results.append({"op": "insert", "id": t['id'], "status": "inserted"})
+                continue
+            t = find(op["id"])
+            if t is None:
+                results.append({"op": op["op"], "id": op["id"], "status": "not_found"})
+            elif op["op"] == "update":
+                old_key = storage.partition_key(t['date'])
+                t.update(op["fields"])
+                new_key = storage.partition_key(t['date'])
+                if new_key != old_key:
+                    loaded[old_key].remove(t)
+                    append(old_key, {"delete": t['id']})
+                    partition(new_key).append(t)
+                    locations[t['id']] = new_key
+                append(new_key, {"upsert": dict(t)})
+                results.append({"op": "update", "id": t['id'], "status": "updated"})
+            else:
+                loaded[storage.partition_key(t['date'])].remove(t)
+                append(storage.partition_key(t['date']), {"delete": t['id']})
+                locations.pop(t['id'], None)
+                results.append({"op": "delete", "id": t['id'], "status": "deleted"})
+        item["response"] = {"results": results}
+        if key is not None:
+            new_records[key] = replay_record(key, item["response"])
+
+    previous = anomaly.current_digests(manifest)
+    try:
+        for key, log in entries.items():
+            storage.append_partition(username, manifest, key, log, loaded.get(key))
+        if entries:
+            storage.save_manifest(username, manifest)
+            update_derived(username, previous, manifest, entries, loaded)
+            storage.mark_changed(username)
+    except Exception:
+        # The in-memory id map may no longer match storage
+        id_locations.pop(username, None)
+        raise
+    if new_records:
+        save_idempotency(username, list(new_records.values()))
+
+
+def update_derived(username, previous, manifest, entries, loaded):
+    """Fold a commit into the stored fingerprint index and spending statistics.
+
+    Open sessions reload after every commit. With these files current they
+    pick up the new rows without re-reading history. Statistics can only
+    take new rows, commits that updated or deleted leave them to backfill.
+    """
+    inserted = []
+    for key, log in entries.items():
+        current = manifest["partitions"].get(key, {}).get("digest")
+        if key in loaded:
+            dedup.update_partition_index(username, key, previous.get(key), current, rows=loaded[key])
+        else:
+            added = [entry["upsert"] for entry in log]
+            dedup.update_partition_index(username, key, previous.get(key), current, added=added)
+            inserted.extend(added)
+    if not loaded:
+        anomaly.record_transactions(username, previous, manifest, inserted)
+
+
+def commit_loop():
+    """Writer thread: drain everything queued and commit it per user"""
+    while True:
+        group = [pending.get()]
+        while len(group) < MAX_GROUP:
+            try:
+                group.append(pending.get_nowait())
+            except queue.Empty:
+                break
+        by_user = {}
+        for item in group:
+            by_user.setdefault(item["username"], []).append(item)
+        for username, items in by_user.items():
+            try:
+                commit_user(username, items)
+            except Exception as e:
+                for item in items:
+                    item["error"] = str(e)
+            for item in items:
+                item["done"].set()
+
+
+def submit(username, operations, key=None):
+    """Queue a batch for the writer and wait for its commit"""
+    item = {"username": username, "operations": operations, "key": key,
+            "done": threading.Event(), "response": None, "error": None}
+    pending.put(item)
+    if not item["done"].wait(COMMIT_TIMEOUT_SECONDS):
+        raise TimeoutError("commit timed out")
+    if item["error"]:
+        raise RuntimeError(item["error"])
+    return item["response"]
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok", "queued": pending.qsize()})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        match = PATH_PATTERN.match(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if not match:
+            self.send_json(404, {"error": "not found"})
+            return
+        username = match.group(1)
+        if username not in known_users():
+            self.send_json(404, {"error": f"unknown user {username}"})
+            return
+        try:
+            body = json.loads(raw or b"null")
+            operations = validate_operations(body)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        key = self.headers.get("Idempotency-Key") or body.get("idempotency_key")
+        try:
+            response = submit(username, operations, key)
+        except TimeoutError as e:
+            self.send_json(503, {"error": str(e)})
+            return
+        except RuntimeError as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for bursts of concurrent feed clients
+    request_queue_size = 128
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT):
+    threading.Thread(target=commit_loop, name="ingest-writer", daemon=True).start()
+    server = IngestServer((host, port), IngestHandler)
+    print(f"Ingesting transactions on http://{host}:{port}/users/<username>/transactions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local transaction ingestion endpoint")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind, keep it local")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from streamlit.errors import StreamlitAPIException
 import json
 import os
 import hashlib
+import uuid
+from forecast import forecast_goals
+import anomaly
+import charts
+import dedup
+import fx
+from fx import format_money
+import schema
+import storage
 
 # Storage file paths
 USERS_FILE = "users.json"
@@ -114,6 +123,10 @@ import os
 # Data file path
 DATA_FILE = "finance_data.json"
 
+ANALYTICS_PERIODS = {"Last 3 months": 3, "Last 6 months": 6, "Last 12 months": 12, "All time": None}
+# How often open sessions check for data written by the ingestion endpoint
+INGEST_POLL_SECONDS = 5
+
 # Auth utilities
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -162,52 +175,228 @@ if 'editing_id' not in st.session_state:
     st.session_state.editing_id = None
 if 'delete_confirm_id' not in st.session_state:
     st.session_state.delete_confirm_id = None
-
-def get_user_data_file():
-    if st.session_state.username:
-        return f"data_{st.session_state.username}.json"
-    return "finance_data.json"
+if 'manifest' not in st.session_state:
+    st.session_state.manifest = storage.empty_manifest()
+if 'loaded_partitions' not in st.session_state:
+    st.session_state.loaded_partitions = set()
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = uuid.uuid4().hex
+if 'background_jobs' not in st.session_state:
+    st.session_state.background_jobs = {}
+if 'fingerprint_index' not in st.session_state:
+    st.session_state.fingerprint_index = None
+if 'duplicate_scan' not in st.session_state:
+    st.session_state.duplicate_scan = None
+if 'spending_stats' not in st.session_state:
+    st.session_state.spending_stats = None
+if 'ingest_revision' not in st.session_state:
+    st.session_state.ingest_revision = None
+if 'pending_duplicate' not in st.session_state:
+    st.session_state.pending_duplicate = None
+if 'save_conflict' not in st.session_state:
+    st.session_state.save_conflict = False
 
 def save_data():
-    """Save all data to local JSON file for current user"""
+    """Save loaded partitions, budgets and goals for current user.
+
+    The save is refused when another session or the ingestion endpoint
+    wrote since the last load. The latest data is then loaded instead and
+    the app reruns with a warning.
+    """
     if not st.session_state.authenticated:
         return
-    data = {
-        "transactions": st.session_state.transactions,
-        "budgets": st.session_state.budgets,
-        "goals": st.session_state.goals
-    }
-    with open(get_user_data_file(), 'w') as f:
-        json.dump(data, f, indent=2)
+    username = st.session_state.username
+    manifest = st.session_state.manifest
+    manifest["budgets"] = st.session_state.budgets
+    manifest["goals"] = st.session_state.goals
+    # Edits can move a transaction into a month that is not loaded yet,
+    # merge that partition first so rewriting it keeps its other rows
+    touched = {storage.partition_key(t['date']) for t in st.session_state.transactions}
+    load_partitions(touched - st.session_state.loaded_partitions)
+    st.session_state.loaded_partitions |= touched
+    with storage.user_lock(username):
+        conflict = storage.revision(username) != st.session_state.ingest_revision
+        if not conflict:
+            changed = storage.save_partitions(
+                username, manifest, st.session_state.transactions, st.session_state.loaded_partitions
+            )
+            st.session_state.ingest_revision = storage.mark_changed(username)
+    if conflict:
+        st.session_state.save_conflict = True
+        load_data()
+        st.rerun()
+    # Cached results only depend on transactions, budget and goal saves keep them
+    if changed:
+        st.session_state.data_version = uuid.uuid4().hex
 
 def load_data():
-    """Load data from local JSON file for current user"""
+    """Load the manifest and recent partitions for current user"""
     if not st.session_state.authenticated:
         return False
-    data_file = get_user_data_file()
-    if os.path.exists(data_file):
-        try:
-            with open(data_file, 'r') as f:
-                data = json.load(f)
-                st.session_state.transactions = data.get('transactions', [])
-                st.session_state.budgets = data.get('budgets', {})
-                st.session_state.goals = data.get('goals', [])
-                return True
-        except Exception as e:
-            st.error(f"Error loading data: {e}")
-    else:
-        # Initialize empty data for new user
-        st.session_state.transactions = []
-        st.session_state.budgets = {}
-        st.session_state.goals = []
-        save_data()
+    try:
+        # Refreshing the snapshot can rewrite unvalidated partitions and the manifest
+        with storage.user_lock(st.session_state.username):
+            st.session_state.ingest_revision = storage.revision(st.session_state.username)
+            manifest = storage.load_manifest(st.session_state.username)
+            storage.refresh_snapshot(st.session_state.username, manifest)
+        keys = storage.hot_partition_keys(manifest)
+        st.session_state.manifest = manifest
+        st.session_state.transactions = storage.load_partitions(st.session_state.username, manifest, keys)
+        st.session_state.loaded_partitions = keys
+        st.session_state.budgets = manifest.get('budgets', {})
+        st.session_state.goals = manifest.get('goals', [])
+        st.session_state.data_version = uuid.uuid4().hex
+        # The fingerprint index and spending statistics are kept, they check
+        # their partition digests and only catch up on what changed
         return True
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
     return False
 
+def load_partitions(keys):
+    """Load stored partitions that are not in session yet"""
+    keys = (set(keys) & set(st.session_state.manifest["partitions"])) - st.session_state.loaded_partitions
+    if not keys:
+        return False
+    st.session_state.transactions.extend(
+        storage.load_partitions(st.session_state.username, st.session_state.manifest, keys)
+    )
+    st.session_state.loaded_partitions |= keys
+    return True
+
+def history_loader(keys):
+    """Callable loading the given partitions, safe to run off the script thread"""
+    keys = set(keys)
+    loaded = keys & st.session_state.loaded_partitions
+    rows = [t for t in st.session_state.transactions if storage.partition_key(t['date']) in loaded]
+    username = st.session_state.username
+    manifest = {"partitions": dict(st.session_state.manifest["partitions"])}
+
+    def load():
+        session_df = pd.DataFrame(rows, columns=storage.TRANSACTION_FIELDS)
+        stored_df = storage.partitions_frame(username, manifest, keys - loaded)
+        frames = [frame for frame in (session_df, stored_df) if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else session_df
+    return load
+
+def history_frame(keys):
+    """DataFrame of the given partitions, using session rows where loaded"""
+    return history_loader(keys)()
+
+def fingerprint_index():
+    """Duplicate fingerprint index of the stored history, refreshed per changed partition"""
+    st.session_state.fingerprint_index = dedup.refresh_index(
+        st.session_state.username, st.session_state.manifest, st.session_state.fingerprint_index
+    )
+    return st.session_state.fingerprint_index
+
+def spending_stats():
+    """Running spending statistics, backfilled only after edits, deletes or imports"""
+    st.session_state.spending_stats = anomaly.refresh_stats(
+        st.session_state.username, st.session_state.manifest, st.session_state.spending_stats
+    )
+    return st.session_state.spending_stats
+
+def load_date_range(start, end):
+    """Load cold partitions covering a date range, True if any were loaded"""
+    return load_partitions(storage.partitions_in_range(st.session_state.manifest, start, end))
+
+def replace_all_transactions(transactions):
+    """Replace the whole stored history, then keep only hot partitions loaded"""
+    username = st.session_state.username
+    with storage.user_lock(username):
+        # Replacing also covers partitions written since the last load
+        manifest = storage.load_manifest(username)
+        storage.replace_transactions(username, manifest, transactions)
+        st.session_state.ingest_revision = storage.mark_changed(username)
+    st.session_state.manifest = manifest
+    keys = storage.hot_partition_keys(manifest)
+    st.session_state.transactions = [
+        t for t in transactions if storage.partition_key(t['date']) in keys
+    ]
+    st.session_state.loaded_partitions = keys
+    st.session_state.data_version = uuid.uuid4().hex
+    save_data()
+
+def reporting_currency():
+    return st.session_state.manifest.get("reporting_currency", fx.BASE_CURRENCY)
+
+@st.cache_data(max_entries=8)
+def cached_rates(rates_version):
+    """FX rate table, reloaded when the rates file changes"""
+    return fx.load_rates()
+
+@st.cache_data(show_spinner="Converting currencies...", max_entries=8)
+def cached_ledger_totals(data_version, rates_version, reporting, _load_frame):
+    """Converted full-history totals, cached until transactions or rates change"""
+    return fx.ledger_totals(_load_frame(), cached_rates(rates_version), reporting)
+
+def ledger_totals():
+    """Full-history totals in the reporting currency"""
+    manifest = st.session_state.manifest
+    reporting = reporting_currency()
+    # Ledgers kept entirely in the reporting currency need no conversion
+    if storage.currencies(manifest) <= {reporting}:
+        return {
+            "types": storage.type_totals(manifest),
+            "expense_categories": storage.category_totals(manifest, 'Expense'),
+            "monthly": storage.monthly_totals(manifest),
+            "missing": [],
+        }
+    return cached_ledger_totals(
+        st.session_state.data_version, fx.rates_version(), reporting,
+        lambda: history_frame(manifest["partitions"])
+    )
+
+@st.cache_data(show_spinner="Running forecast...", max_entries=128)
+def cached_goal_forecast(data_version, rates_version, reporting, today, target, current, deadline, _monthly):
+    """Monte Carlo forecast of one goal, cached per data version, rates and day"""
+    goal = {"target": target, "current": current, "deadline": deadline}
+    return forecast_goals(_monthly, [goal], today=today)[0]
+
+@st.cache_resource
+def get_executor():
+    """Thread pool shared by all sessions for chart and aggregate computations"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="perfin")
+
+def run_in_background(name, version, fn, *args):
+    """Start fn in the thread pool once per version and return its future"""
+    job = st.session_state.background_jobs.get(name)
+    if job is None or job[0] != version:
+        job = (version, get_executor().submit(fn, *args))
+        st.session_state.background_jobs[name] = job
+    return job[1]
+
+def rerun_fragment():
+    """Rerun the current fragment, or the whole app outside a fragment rerun"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def ingest_watcher():
+    """Rerun the app when the ingestion endpoint has written new data"""
+    if storage.revision(st.session_state.username) != st.session_state.ingest_revision:
+        st.rerun()
+
+def show_pending(future, *placeholders):
+    """Fill placeholders with a loading note while a background job runs"""
+    if not future.done():
+        for placeholder in placeholders:
+            placeholder.info("⏳ Crunching numbers...")
+
 # Initialize session state from file (after authentication)
 if st.session_state.authenticated and not st.session_state.data_loaded:
     load_data()
     st.session_state.data_loaded = True
+elif st.session_state.authenticated and storage.revision(st.session_state.username) != st.session_state.ingest_revision:
+    load_data()
+
+if st.session_state.save_conflict:
+    st.session_state.save_conflict = False
+    st.warning("⚠️ New data was saved elsewhere while you were editing, so your last change was not saved. "
+               "The latest data is loaded now, please make the change again.")
 
 def login_register_page():
     st.markdown('<div class="main-header">Welcome to Finance Manager</div>', unsafe_allow_html=True)
@@ -246,9 +435,20 @@ else:
 
     def get_next_id():
         """Get next available transaction ID"""
-        if not st.session_state.transactions:
-            return 1
-        return max(t['id'] for t in st.session_state.transactions) + 1
+        loaded_max = max((t['id'] for t in st.session_state.transactions), default=0)
+        return max(storage.next_transaction_id(st.session_state.manifest), loaded_max + 1)
+
+    def add_transaction(new_transaction):
+        """Add a transaction and fold it into the spending statistics"""
+        stats = spending_stats()
+        new_transaction = dict(new_transaction, id=get_next_id())
+        st.session_state.transactions.append(new_transaction)
+        save_data()
+        anomaly.record_transaction(
+            st.session_state.username, st.session_state.manifest, stats, new_transaction
+        )
+        st.success("✅ Transaction added successfully!")
+        st.balloons()
 
     def delete_transaction(transaction_id):
         """Delete a transaction by ID"""
@@ -272,6 +472,192 @@ else:
         st.success("✅ Transaction updated successfully!")
         st.rerun()
 
+    def set_row_mode(trans_id, editing=False, deleting=False):
+        """Switch a transaction row between view, edit and delete modes"""
+        others = {st.session_state.editing_id, st.session_state.delete_confirm_id} - {None, trans_id}
+        st.session_state.editing_id = trans_id if editing else None
+        st.session_state.delete_confirm_id = trans_id if deleting else None
+        # Only this row changes unless another row has to leave its mode too
+        if others:
+            st.rerun()
+        rerun_fragment()
+
+    @st.fragment
+    def transaction_row(trans):
+        """One transaction in View & Manage, rerun on its own"""
+        trans_id = trans['id']
+        is_editing = st.session_state.editing_id == trans_id
+        is_deleting = st.session_state.delete_confirm_id == trans_id
+
+        icon = "🟢" if trans['type'] == 'Income' else "🔴"
+
+        # Edit Mode
+        if is_editing:
+            with st.container():
+                st.markdown("#### ✏️ Edit Transaction")
+                with st.form(f"edit_form_{trans_id}"):
+                    col1, col2, col3, col4, col5 = st.columns(5)
+
+                    with col1:
+                        new_type = st.selectbox("Type", schema.TRANSACTION_TYPES, 
+                                              index=0 if trans['type'] == 'Expense' else 1,
+                                              key=f"type_{trans_id}")
+                    with col2:
+                        category = trans['category'] if trans['category'] in schema.CATEGORIES \
+                            else schema.FALLBACK_CATEGORY
+                        new_category = st.selectbox("Category", schema.CATEGORIES,
+                            index=schema.CATEGORIES.index(category),
+                            key=f"cat_{trans_id}")
+                    with col3:
+                        new_amount = st.number_input("Amount", min_value=0.01, value=float(trans['amount']),
+                                                   key=f"amt_{trans_id}")
+                    with col4:
+                        currency_options = fx.CURRENCIES if trans['currency'] in fx.CURRENCIES \
+                            else fx.CURRENCIES + [trans['currency']]
+                        new_currency = st.selectbox("Currency", currency_options,
+                                                    index=currency_options.index(trans['currency']),
+                                                    key=f"cur_{trans_id}")
+                    with col5:
+                        new_date = st.date_input("Date", pd.Timestamp(trans['date']).date(),
+                                                key=f"date_{trans_id}")
+
+                    new_desc = st.text_input("Description", value=trans['description'],
+                                           key=f"desc_{trans_id}")
+
+                    col_save, col_cancel = st.columns(2)
+                    with col_save:
+                        if st.form_submit_button("💾 Save Changes", use_container_width=True):
+                            update_transaction(trans_id, {
+                                'type': new_type,
+                                'category': new_category,
+                                'amount': new_amount,
+                                'date': new_date.strftime('%Y-%m-%d'),
+                                'description': new_desc,
+                                'currency': new_currency
+                            })
+                    with col_cancel:
+                        if st.form_submit_button("❌ Cancel", use_container_width=True):
+                            set_row_mode(trans_id)
+
+        # Delete Confirmation Mode
+        elif is_deleting:
+            with st.container():
+                st.error(f"⚠️ Are you sure you want to delete this transaction?")
+                col1, col2, col3 = st.columns([2, 1, 1])
+                with col1:
+                    st.write(f"**{trans['date']}** - {trans['category']} - {format_money(trans['amount'], trans['currency'])}")
+                with col2:
+                    if st.button("✅ Yes, Delete", key=f"confirm_del_{trans_id}", use_container_width=True):
+                        delete_transaction(trans_id)
+                with col3:
+                    if st.button("❌ Cancel", key=f"cancel_del_{trans_id}", use_container_width=True):
+                        set_row_mode(trans_id)
+                st.markdown("---")
+
+        # Normal View Mode
+        else:
+            with st.container():
+                cols = st.columns([0.5, 1.5, 1.5, 2, 1.5, 1, 1])
+
+                with cols[0]:
+                    st.write(f"{icon}")
+                with cols[1]:
+                    st.write(f"**{trans['date']}**")
+                with cols[2]:
+                    color = "green" if trans['type'] == 'Income' else "red"
+                    st.write(f"<span style='color:{color}; font-weight:600;'>{trans['category']}</span>", 
+                            unsafe_allow_html=True)
+                with cols[3]:
+                    st.write(f"{trans['description']}")
+                with cols[4]:
+                    color = "green" if trans['type'] == 'Income' else "red"
+                    sign = "+" if trans['type'] == 'Income' else "-"
+                    st.write(f"<span style='color:{color}; font-weight:700;'>{sign}{format_money(trans['amount'], trans['currency'])}</span>", 
+                            unsafe_allow_html=True)
+                with cols[5]:
+                    if st.button("✏️ Edit", key=f"edit_{trans_id}", use_container_width=True):
+                        set_row_mode(trans_id, editing=True)
+                with cols[6]:
+                    if st.button("🗑️ Delete", key=f"delete_{trans_id}", use_container_width=True):
+                        set_row_mode(trans_id, deleting=True)
+
+                st.markdown("---")
+
+    @st.fragment
+    def budget_editor(category, current_spending, reporting):
+        """Budget input and progress for one category, rerun on its own"""
+        current_budget = st.session_state.budgets.get(category, 0)
+        new_budget = st.number_input(
+            f"{category} Budget ({reporting})",
+            min_value=0.0,
+            value=float(current_budget),
+            key=f"budget_{category}"
+        )
+        st.session_state.budgets[category] = new_budget
+        
+        # Auto-save budget changes if they are different from session state
+        if st.session_state.get(f"prev_budget_{category}") != new_budget:
+            st.session_state[f"prev_budget_{category}"] = new_budget
+            save_data()
+        
+        if new_budget > 0:
+            progress = min(current_spending / new_budget, 1)
+            st.progress(progress)
+            st.caption(f"Spent: {format_money(current_spending, reporting)} / {format_money(new_budget, reporting)}")
+            
+            if current_spending > new_budget:
+                st.error(f"⚠️ Over budget by {format_money(current_spending - new_budget, reporting)}!")
+            elif progress > 0.8:
+                st.warning("⚠️ Approaching budget limit!")
+
+    @st.fragment
+    def goal_card(i, monthly, reporting):
+        """Progress, forecast and contributions for one goal, rerun on its own"""
+        goal = st.session_state.goals[i]
+        progress = goal['current'] / goal['target'] if goal['target'] > 0 else 0
+        forecast = cached_goal_forecast(
+            st.session_state.data_version,
+            fx.rates_version(),
+            reporting,
+            datetime.now().strftime("%Y-%m-%d"),
+            goal['target'],
+            goal['current'],
+            goal['deadline'],
+            monthly
+        )
+        
+        with st.container():
+            col1, col2, col3 = st.columns([2, 2, 1])
+            
+            with col1:
+                st.markdown(f"### {goal['name']}")
+                st.caption(f"Deadline: {goal['deadline']}")
+            
+            with col2:
+                st.progress(min(progress, 1.0))
+                st.caption(f"{format_money(goal['current'], reporting)} of {format_money(goal['target'], reporting)} ({progress*100:.1f}%)")
+                if forecast['probability'] is None:
+                    st.caption("🔮 Add transactions to forecast this goal")
+                else:
+                    completion = forecast['completion'] or "beyond forecast horizon"
+                    st.caption(f"🔮 {forecast['probability']*100:.0f}% chance by deadline | "
+                               f"Projected completion: {completion}")
+            
+            with col3:
+                add_amount = st.number_input(
+                    "Add amount", 
+                    min_value=0.0, 
+                    key=f"add_goal_{i}",
+                    label_visibility="collapsed"
+                )
+                if add_amount > 0:
+                    if st.button("💰", key=f"btn_goal_{i}"):
+                        st.session_state.goals[i]['current'] += add_amount
+                        save_data()
+                        rerun_fragment()
+            
+            st.markdown("---")
+
     # Sidebar navigation
     with st.sidebar:
         st.markdown(f"### 👋 Welcome, {st.session_state.username}")
@@ -279,7 +665,10 @@ else:
             st.session_state.authenticated = False
             st.session_state.username = None
             st.session_state.data_loaded = False
+            st.session_state.fingerprint_index = None
+            st.session_state.spending_stats = None
             st.rerun()
+        ingest_watcher()
             
         st.markdown("---")
         st.markdown("### 💰 Finance Manager")
@@ -294,13 +683,18 @@ else:
         st.markdown("---")
         st.markdown("### Quick Stats")
         
-        total_income = sum(t['amount'] for t in st.session_state.transactions if t['type'] == 'Income')
-        total_expense = sum(t['amount'] for t in st.session_state.transactions if t['type'] == 'Expense')
+        # Totals cover the full history, in the reporting currency
+        reporting = reporting_currency()
+        totals = ledger_totals()
+        total_income = totals["types"].get('Income', 0)
+        total_expense = totals["types"].get('Expense', 0)
         balance = total_income - total_expense
         
-        st.metric("Balance", f"${balance:,.2f}")
-        st.metric("Monthly Income", f"${total_income:,.2f}")
-        st.metric("Monthly Expense", f"${total_expense:,.2f}")
+        st.metric("Balance", format_money(balance, reporting))
+        st.metric("Monthly Income", format_money(total_income, reporting))
+        st.metric("Monthly Expense", format_money(total_expense, reporting))
+        if totals["missing"]:
+            st.warning(f"No FX rate for {', '.join(totals['missing'])}, excluded from totals")
 
     # Dashboard Page
     if page == "📊 Dashboard":
@@ -313,7 +707,7 @@ else:
             st.markdown(f"""
             <div class="metric-card">
                 <h3 style="margin:0; font-size: 0.9rem; opacity: 0.9;">Total Balance</h3>
-                <h2 style="margin:0; font-size: 2rem;">${balance:,.2f}</h2>
+                <h2 style="margin:0; font-size: 2rem;">{format_money(balance, reporting)}</h2>
             </div>
             """, unsafe_allow_html=True)
         
@@ -321,7 +715,7 @@ else:
             st.markdown(f"""
             <div class="income-card">
                 <h3 style="margin:0; font-size: 0.9rem; opacity: 0.9;">Total Income</h3>
-                <h2 style="margin:0; font-size: 2rem;">${total_income:,.2f}</h2>
+                <h2 style="margin:0; font-size: 2rem;">{format_money(total_income, reporting)}</h2>
             </div>
             """, unsafe_allow_html=True)
         
@@ -329,7 +723,7 @@ else:
             st.markdown(f"""
             <div class="expense-card">
                 <h3 style="margin:0; font-size: 0.9rem; opacity: 0.9;">Total Expenses</h3>
-                <h2 style="margin:0; font-size: 2rem;">${total_expense:,.2f}</h2>
+                <h2 style="margin:0; font-size: 2rem;">{format_money(total_expense, reporting)}</h2>
             </div>
             """, unsafe_allow_html=True)
         
@@ -344,56 +738,39 @@ else:
         
         st.markdown("<br>", unsafe_allow_html=True)
         
-        # Charts Row
+        # Spending alerts from the running per-category and per-period statistics
+        alerts = anomaly.spending_alerts(spending_stats(), st.session_state.transactions)
+        if alerts:
+            st.subheader("🚨 Spending Alerts")
+            for alert in alerts[:3]:
+                st.warning(alert["message"])
+            if len(alerts) > 3:
+                with st.expander(f"{len(alerts) - 3} more alerts"):
+                    for alert in alerts[3:]:
+                        st.write(alert["message"])
+        
+        # Charts Row, computed in the background while the rest of the page renders
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📊 Income vs Expenses")
-            
-            df = pd.DataFrame(st.session_state.transactions)
-            df['date'] = pd.to_datetime(df['date'])
-            
-            daily_summary = df.groupby(['date', 'type'])['amount'].sum().reset_index()
-            pivot_df = daily_summary.pivot(index='date', columns='type', values='amount').fillna(0)
-            
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=pivot_df.index, y=pivot_df.get('Income', [0]*len(pivot_df)),
-                mode='lines+markers', name='Income',
-                line=dict(color='#4facfe', width=3),
-                fill='tozeroy'
-            ))
-            fig.add_trace(go.Scatter(
-                x=pivot_df.index, y=pivot_df.get('Expense', [0]*len(pivot_df)),
-                mode='lines+markers', name='Expenses',
-                line=dict(color='#f5576c', width=3),
-                fill='tozeroy'
-            ))
-            fig.update_layout(
-                height=400,
-                template='plotly_white',
-                hovermode='x unified',
-                margin=dict(l=20, r=20, t=30, b=20)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            income_expense_slot = st.empty()
         
         with col2:
             st.subheader("📈 Expense Breakdown")
-            
-            expenses_df = df[df['type'] == 'Expense']
-            if not expenses_df.empty:
-                category_expenses = expenses_df.groupby('category')['amount'].sum().reset_index()
-                
-                fig = px.pie(
-                    category_expenses, values='amount', names='category',
-                    hole=0.6, color_discrete_sequence=px.colors.sequential.Viridis
-                )
-                fig.update_layout(
-                    height=400,
-                    showlegend=True,
-                    margin=dict(l=20, r=20, t=30, b=20)
-                )
-                st.plotly_chart(fig, use_container_width=True)
+            expense_breakdown_slot = st.empty()
+        
+        dashboard_job = run_in_background(
+            "dashboard",
+            (st.session_state.data_version, tuple(sorted(st.session_state.loaded_partitions)),
+             fx.rates_version(), reporting),
+            charts.dashboard_charts,
+            pd.DataFrame(st.session_state.transactions, columns=storage.TRANSACTION_FIELDS),
+            totals["expense_categories"],
+            cached_rates(fx.rates_version()),
+            reporting
+        )
+        show_pending(dashboard_job, income_expense_slot, expense_breakdown_slot)
         
         # Recent Transactions with Edit/Delete
         st.subheader("🕐 Recent Transactions")
@@ -418,13 +795,20 @@ else:
                         </div>
                         <div style="text-align: right; min-width: 150px;">
                             <span style="color: {'green' if trans['type'] == 'Income' else 'red'}; font-weight: 700; font-size: 1.1rem;">
-                                {'+' if trans['type'] == 'Income' else '-'}${trans['amount']:,.2f}
+                                {'+' if trans['type'] == 'Income' else '-'}{format_money(trans['amount'], trans['currency'])}
                             </span>
                         </div>
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
 
+        dashboard_charts = dashboard_job.result()
+        income_expense_slot.plotly_chart(dashboard_charts["income_expense"], use_container_width=True)
+        if dashboard_charts["expense_breakdown"] is not None:
+            expense_breakdown_slot.plotly_chart(dashboard_charts["expense_breakdown"], use_container_width=True)
+        else:
+            expense_breakdown_slot.empty()
+
     # Transactions Page with Full Edit/Delete
     elif page == "💳 Transactions":
         st.markdown('<div class="main-header">Transaction Management</div>', unsafe_allow_html=True)
@@ -437,14 +821,15 @@ else:
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    trans_type = st.selectbox("Type", ["Expense", "Income"])
-                    category = st.selectbox(
-                        "Category",
-                        ["Food", "Transport", "Housing", "Entertainment", "Utilities", "Healthcare", "Shopping", "Salary", "Freelance", "Investment", "Other"]
-                    )
+                    trans_type = st.selectbox("Type", schema.TRANSACTION_TYPES)
+                    category = st.selectbox("Category", schema.CATEGORIES)
                 
                 with col2:
-                    amount = st.number_input("Amount ($)", min_value=0.01, step=0.01)
+                    amount = st.number_input("Amount", min_value=0.01, step=0.01)
+                    currency = st.selectbox(
+                        "Currency", fx.CURRENCIES,
+                        index=fx.CURRENCIES.index(reporting) if reporting in fx.CURRENCIES else 0
+                    )
                     date = st.date_input("Date", datetime.now())
                 
                 description = st.text_input("Description", placeholder="Enter details...")
@@ -458,16 +843,44 @@ else:
                         "category": category,
                         "amount": amount,
                         "type": trans_type,
-                        "description": description
+                        "description": description,
+                        "currency": currency
                     }
-                    st.session_state.transactions.append(new_transaction)
-                    save_data()
-                    st.success("✅ Transaction added successfully!")
-                    st.balloons()
+                    duplicate_id = dedup.find_duplicate(fingerprint_index(), new_transaction)
+                    if duplicate_id is not None:
+                        # The form is cleared on submit, so the entry waits here for confirmation
+                        st.session_state.pending_duplicate = {"transaction": new_transaction,
+                                                              "duplicate_id": duplicate_id}
+                    else:
+                        st.session_state.pending_duplicate = None
+                        add_transaction(new_transaction)
+            
+            pending_duplicate = st.session_state.pending_duplicate
+            if pending_duplicate:
+                pending = pending_duplicate["transaction"]
+                prompt = st.empty()
+                with prompt.container():
+                    st.warning(
+                        f"⚠️ {pending['type']} of {format_money(pending['amount'], pending['currency'])} "
+                        f"for {pending['category']} on {pending['date']} looks like a duplicate of "
+                        f"transaction #{pending_duplicate['duplicate_id']}."
+                    )
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        confirmed = st.button("➕ Add Anyway", key="confirm_duplicate", use_container_width=True)
+                    with col2:
+                        discarded = st.button("✖️ Discard", key="discard_duplicate", use_container_width=True)
+                if confirmed or discarded:
+                    st.session_state.pending_duplicate = None
+                    prompt.empty()
+                if confirmed:
+                    add_transaction(pending)
         
         # Tab 2: View & Manage with Edit/Delete
         with tab2:
-            if st.session_state.transactions:
+            if st.session_state.manifest["partitions"]:
+                if not st.session_state.transactions:
+                    load_partitions(storage.hot_partition_keys(st.session_state.manifest))
                 df = pd.DataFrame(st.session_state.transactions)
                 df['date'] = pd.to_datetime(df['date'])
                 df = df.sort_values('date', ascending=False)
@@ -484,6 +897,10 @@ else:
                     
                     search_term = st.text_input("Search description", placeholder="Type to search...")
                 
+                # Older months are loaded on demand when the range reaches back
+                if len(date_range) == 2 and load_date_range(date_range[0], date_range[1]):
+                    st.rerun()
+                
                 # Apply filters
                 mask = (
                     df['type'].isin(filter_type) &
@@ -500,104 +917,7 @@ else:
                 st.write(f"Showing {len(filtered_df)} transactions")
                 
                 for idx, trans in filtered_df.iterrows():
-                    trans_id = trans['id']
-                    is_editing = st.session_state.editing_id == trans_id
-                    is_deleting = st.session_state.delete_confirm_id == trans_id
-                    
-                    row_class = "transaction-income" if trans['type'] == 'Income' else "transaction-expense"
-                    icon = "🟢" if trans['type'] == 'Income' else "🔴"
-                    
-                    # Edit Mode
-                    if is_editing:
-                        with st.container():
-                            st.markdown("#### ✏️ Edit Transaction")
-                            with st.form(f"edit_form_{trans_id}"):
-                                col1, col2, col3, col4 = st.columns(4)
-                                
-                                with col1:
-                                    new_type = st.selectbox("Type", ["Expense", "Income"], 
-                                                          index=0 if trans['type'] == 'Expense' else 1,
-                                                          key=f"type_{trans_id}")
-                                with col2:
-                                    new_category = st.selectbox("Category",
-                                        ["Food", "Transport", "Housing", "Entertainment", "Utilities", 
-                                         "Healthcare", "Shopping", "Salary", "Freelance", "Investment", "Other"],
-                                        index=["Food", "Transport", "Housing", "Entertainment", "Utilities", 
-                                               "Healthcare", "Shopping", "Salary", "Freelance", "Investment", "Other"].index(trans['category']),
-                                        key=f"cat_{trans_id}")
-                                with col3:
-                                    new_amount = st.number_input("Amount", min_value=0.01, value=float(trans['amount']),
-                                                               key=f"amt_{trans_id}")
-                                with col4:
-                                    new_date = st.date_input("Date", datetime.strptime(trans['date'], '%Y-%m-%d'),
-                                                            key=f"date_{trans_id}")
-                                
-                                new_desc = st.text_input("Description", value=trans['description'],
-                                                       key=f"desc_{trans_id}")
-                                
-                                col_save, col_cancel = st.columns(2)
-                                with col_save:
-                                    if st.form_submit_button("💾 Save Changes", use_container_width=True):
-                                        update_transaction(trans_id, {
-                                            'type': new_type,
-                                            'category': new_category,
-                                            'amount': new_amount,
-                                            'date': new_date.strftime('%Y-%m-%d'),
-                                            'description': new_desc
-                                        })
-                                with col_cancel:
-                                    if st.form_submit_button("❌ Cancel", use_container_width=True):
-                                        st.session_state.editing_id = None
-                                        st.rerun()
-                    
-                    # Delete Confirmation Mode
-                    elif is_deleting:
-                        with st.container():
-                            st.error(f"⚠️ Are you sure you want to delete this transaction?")
-                            col1, col2, col3 = st.columns([2, 1, 1])
-                            with col1:
-                                st.write(f"**{trans['date']}** - {trans['category']} - ${trans['amount']:,.2f}")
-                            with col2:
-                                if st.button("✅ Yes, Delete", key=f"confirm_del_{trans_id}", use_container_width=True):
-                                    delete_transaction(trans_id)
-                            with col3:
-                                if st.button("❌ Cancel", key=f"cancel_del_{trans_id}", use_container_width=True):
-                                    st.session_state.delete_confirm_id = None
-                                    st.rerun()
-                            st.markdown("---")
-                    
-                    # Normal View Mode
-                    else:
-                        with st.container():
-                            cols = st.columns([0.5, 1.5, 1.5, 2, 1.5, 1, 1])
-                            
-                            with cols[0]:
-                                st.write(f"{icon}")
-                            with cols[1]:
-                                st.write(f"**{trans['date']}**")
-                            with cols[2]:
-                                color = "green" if trans['type'] == 'Income' else "red"
-                                st.write(f"<span style='color:{color}; font-weight:600;'>{trans['category']}</span>", 
-                                        unsafe_allow_html=True)
-                            with cols[3]:
-                                st.write(f"{trans['description']}")
-                            with cols[4]:
-                                color = "green" if trans['type'] == 'Income' else "red"
-                                sign = "+" if trans['type'] == 'Income' else "-"
-                                st.write(f"<span style='color:{color}; font-weight:700;'>{sign}${trans['amount']:,.2f}</span>", 
-                                        unsafe_allow_html=True)
-                            with cols[5]:
-                                if st.button("✏️ Edit", key=f"edit_{trans_id}", use_container_width=True):
-                                    st.session_state.editing_id = trans_id
-                                    st.session_state.delete_confirm_id = None
-                                    st.rerun()
-                            with cols[6]:
-                                if st.button("🗑️ Delete", key=f"delete_{trans_id}", use_container_width=True):
-                                    st.session_state.delete_confirm_id = trans_id
-                                    st.session_state.editing_id = None
-                                    st.rerun()
-                            
-                            st.markdown("---")
+                    transaction_row(trans)
                 
                 # Export option
                 if not filtered_df.empty:
@@ -631,7 +951,7 @@ else:
                     with col2:
                         icon = "🟢" if trans['type'] == 'Income' else "🔴"
                         st.write(f"{icon} **{trans['date']}** | {trans['category']} | {trans['description']} | "
-                                f"{'+' if trans['type'] == 'Income' else '-'}${trans['amount']:,.2f}")
+                                f"{'+' if trans['type'] == 'Income' else '-'}{format_money(trans['amount'], trans['currency'])}")
                 
                 if to_delete:
                     st.warning(f"⚠️ You are about to delete {len(to_delete)} transaction(s)")
@@ -656,8 +976,7 @@ else:
                     confirm_text = st.text_input("Type 'DELETE ALL' to confirm")
                     if confirm_text == "DELETE ALL":
                         if st.button("🗑️ DELETE EVERYTHING", type="secondary"):
-                            st.session_state.transactions = []
-                            save_data()
+                            replace_all_transactions([])
                             st.success("All transactions deleted!")
                             st.rerun()
             else:
@@ -667,73 +986,48 @@ else:
     elif page == "📈 Analytics":
         st.markdown('<div class="main-header">Financial Analytics</div>', unsafe_allow_html=True)
         
-        if st.session_state.transactions:
-            df = pd.DataFrame(st.session_state.transactions)
-            df['date'] = pd.to_datetime(df['date'])
-            df['month'] = df['date'].dt.strftime('%Y-%m')
+        if st.session_state.manifest["partitions"]:
+            period = st.selectbox("Period", list(ANALYTICS_PERIODS), index=2)
+            latest_key = max(st.session_state.manifest["partitions"])
+            months = ANALYTICS_PERIODS[period]
+            start_key = storage.shift_key(latest_key, -(months - 1)) if months else min(st.session_state.manifest["partitions"])
+            # Older partitions are read from the snapshot, not loaded into session
+            analytics_job = run_in_background(
+                "analytics",
+                (st.session_state.data_version, tuple(sorted(st.session_state.loaded_partitions)),
+                 fx.rates_version(), reporting, start_key),
+                charts.analytics_charts,
+                history_loader(k for k in st.session_state.manifest["partitions"] if k >= start_key),
+                cached_rates(fx.rates_version()),
+                reporting
+            )
             
             # Monthly Trends
             st.subheader("📊 Monthly Trends")
-            
-            monthly_data = df.groupby(['month', 'type'])['amount'].sum().reset_index()
-            monthly_pivot = monthly_data.pivot(index='month', columns='type', values='amount').fillna(0)
-            
-            fig = go.Figure()
-            if 'Income' in monthly_pivot.columns:
-                fig.add_trace(go.Bar(
-                    name='Income',
-                    x=monthly_pivot.index,
-                    y=monthly_pivot['Income'],
-                    marker_color='#4facfe'
-                ))
-            if 'Expense' in monthly_pivot.columns:
-                fig.add_trace(go.Bar(
-                    name='Expenses',
-                    x=monthly_pivot.index,
-                    y=monthly_pivot['Expense'],
-                    marker_color='#f5576c'
-                ))
-            
-            fig.update_layout(
-                barmode='group',
-                height=500,
-                template='plotly_white',
-                xaxis_title="Month",
-                yaxis_title="Amount ($)",
-                hovermode='x unified'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            monthly_trends_slot = st.empty()
             
             # Category Analysis
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("🏷️ Top Spending Categories")
-                expenses_df = df[df['type'] == 'Expense']
-                if not expenses_df.empty:
-                    category_stats = expenses_df.groupby('category').agg({
-                        'amount': ['sum', 'count']
-                    }).round(2)
-                    category_stats.columns = ['Total Spent', 'Transactions']
-                    category_stats = category_stats.sort_values('Total Spent', ascending=False)
-                    st.dataframe(category_stats, use_container_width=True)
+                category_stats_slot = st.empty()
             
             with col2:
                 st.subheader("📅 Spending Patterns")
-                if not expenses_df.empty:
-                    expenses_df['day_of_week'] = expenses_df['date'].dt.day_name()
-                    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                    day_spending = expenses_df.groupby('day_of_week')['amount'].sum().reindex(day_order).fillna(0)
-                    
-                    fig = px.bar(
-                        x=day_spending.index,
-                        y=day_spending.values,
-                        labels={'x': 'Day of Week', 'y': 'Total Spent ($)'},
-                        color=day_spending.values,
-                        color_continuous_scale='Viridis'
-                    )
-                    fig.update_layout(height=400)
-                    st.plotly_chart(fig, use_container_width=True)
+                weekday_spending_slot = st.empty()
+            
+            show_pending(analytics_job, monthly_trends_slot, category_stats_slot, weekday_spending_slot)
+            analytics_charts = analytics_job.result()
+            monthly_trends_slot.plotly_chart(analytics_charts["monthly_trends"], use_container_width=True)
+            if analytics_charts["category_stats"] is not None:
+                category_stats_slot.dataframe(analytics_charts["category_stats"], use_container_width=True)
+            else:
+                category_stats_slot.empty()
+            if analytics_charts["weekday_spending"] is not None:
+                weekday_spending_slot.plotly_chart(analytics_charts["weekday_spending"], use_container_width=True)
+            else:
+                weekday_spending_slot.empty()
         else:
             st.info("Add transactions to see analytics!")
 
@@ -747,42 +1041,13 @@ else:
             st.subheader("Set Monthly Budgets")
             
             categories = ["Food", "Transport", "Housing", "Entertainment", "Utilities", "Healthcare", "Shopping", "Other"]
+            expense_totals = totals["expense_categories"]
             
             col1, col2 = st.columns(2)
             
             for i, category in enumerate(categories):
                 with (col1 if i % 2 == 0 else col2):
-                    current_budget = st.session_state.budgets.get(category, 0)
-                    new_budget = st.number_input(
-                        f"{category} Budget ($)",
-                        min_value=0,
-                        value=current_budget,
-                        key=f"budget_{category}"
-                    )
-                    st.session_state.budgets[category] = new_budget
-                    save_data()
-                    
-                    # Auto-save budget changes if they are different from session state
-                    # Note: streamlit's widget handling means we might want to trigger save here
-                    if st.session_state.get(f"prev_budget_{category}") != new_budget:
-                        st.session_state[f"prev_budget_{category}"] = new_budget
-                        save_data()
-                    
-                    # Calculate current spending
-                    current_spending = sum(
-                        t['amount'] for t in st.session_state.transactions
-                        if t['category'] == category and t['type'] == 'Expense'
-                    )
-                    
-                    if new_budget > 0:
-                        progress = min(current_spending / new_budget, 1)
-                        st.progress(progress)
-                        st.caption(f"Spent: ${current_spending:,.2f} / ${new_budget:,.2f}")
-                        
-                        if current_spending > new_budget:
-                            st.error(f"⚠️ Over budget by ${current_spending - new_budget:,.2f}!")
-                        elif progress > 0.8:
-                            st.warning("⚠️ Approaching budget limit!")
+                    budget_editor(category, expense_totals.get(category, {}).get('amount', 0), reporting)
             
             st.success("Budgets updated automatically!")
         
@@ -794,7 +1059,7 @@ else:
                 with col1:
                     goal_name = st.text_input("Goal Name", placeholder="e.g., Emergency Fund")
                 with col2:
-                    target_amount = st.number_input("Target Amount ($)", min_value=1.0, step=100.0)
+                    target_amount = st.number_input(f"Target Amount ({reporting})", min_value=1.0, step=100.0)
                 with col3:
                     deadline = st.date_input("Target Date", datetime.now() + timedelta(days=365))
                 
@@ -811,34 +1076,8 @@ else:
             
             # Display Goals
             if st.session_state.goals:
-                for i, goal in enumerate(st.session_state.goals):
-                    progress = goal['current'] / goal['target'] if goal['target'] > 0 else 0
-                    
-                    with st.container():
-                        col1, col2, col3 = st.columns([2, 2, 1])
-                        
-                        with col1:
-                            st.markdown(f"### {goal['name']}")
-                            st.caption(f"Deadline: {goal['deadline']}")
-                        
-                        with col2:
-                            st.progress(min(progress, 1.0))
-                            st.caption(f"${goal['current']:,.2f} of ${goal['target']:,.2f} ({progress*100:.1f}%)")
-                        
-                        with col3:
-                            add_amount = st.number_input(
-                                "Add $", 
-                                min_value=0.0, 
-                                key=f"add_goal_{i}",
-                                label_visibility="collapsed"
-                            )
-                            if add_amount > 0:
-                                if st.button("💰", key=f"btn_goal_{i}"):
-                                    st.session_state.goals[i]['current'] += add_amount
-                                    save_data()
-                                    st.rerun()
-                        
-                        st.markdown("---")
+                for i in range(len(st.session_state.goals)):
+                    goal_card(i, totals["monthly"], reporting)
 
     # Settings Page
     elif page == "⚙️ Settings":
@@ -851,7 +1090,7 @@ else:
         with col1:
             st.info("### Export Data")
             data = {
-                "transactions": st.session_state.transactions,
+                "transactions": storage.read_all_transactions(st.session_state.username, st.session_state.manifest),
                 "budgets": st.session_state.budgets,
                 "goals": st.session_state.goals
             }
@@ -865,15 +1104,130 @@ else:
         
         with col2:
             st.warning("### Import Data")
+            import_mode = st.radio("Import mode", ["Replace all data", "Merge, skipping duplicates"])
             uploaded_file = st.file_uploader("Upload backup file", type=['json'])
-            if uploaded_file is not None:
+            # The uploader keeps its file across reruns, import each upload once
+            if uploaded_file is not None and st.session_state.get('imported_file_id') != uploaded_file.file_id:
+                st.session_state.imported_file_id = uploaded_file.file_id
                 data = json.load(uploaded_file)
-                st.session_state.transactions = data.get('transactions', [])
-                st.session_state.budgets = data.get('budgets', {})
-                st.session_state.goals = data.get('goals', [])
-                save_data()
-                st.success("✅ Data restored successfully!")
-                st.rerun()
+                transactions, rejected, fixes = schema.validate(data.get('transactions', []))
+                storage.quarantine(st.session_state.username, rejected, "import")
+                if rejected:
+                    st.warning(f"⚠️ {len(rejected)} invalid rows were quarantined, see Data Quality below")
+                if fixes:
+                    st.info("Fixed on import: " + ", ".join(f"{fix} ({count})" for fix, count in fixes.items()))
+                # A quarantine report holds only the rejected rows, so it is always merged
+                if import_mode == "Replace all data" and not data.get('quarantine_report'):
+                    st.session_state.budgets = data.get('budgets', {})
+                    st.session_state.goals = data.get('goals', [])
+                    replace_all_transactions(transactions)
+                    st.success("✅ Data restored successfully!")
+                else:
+                    index = fingerprint_index()
+                    next_id = get_next_id()
+                    added, skipped = 0, 0
+                    for t in transactions:
+                        if dedup.find_duplicate(index, t) is not None:
+                            skipped += 1
+                            continue
+                        t = dict(t, id=next_id)
+                        next_id += 1
+                        # Indexing kept rows also catches duplicates within the file
+                        dedup.add_to_index(index, t)
+                        st.session_state.transactions.append(t)
+                        added += 1
+                    save_data()
+                    st.success(f"✅ Imported {added} transactions, skipped {skipped} duplicates")
+        
+        st.markdown("---")
+        
+        st.subheader("🧪 Data Quality")
+        
+        quarantined = storage.load_quarantine(st.session_state.username)
+        if not quarantined:
+            st.success("No quarantined rows. All stored transactions passed validation.")
+        else:
+            st.warning(f"{len(quarantined)} rows were rejected while loading or importing data and are "
+                       "not part of your history. Fix them in the report and import it to restore them, "
+                       "it is always merged into your history.")
+            st.dataframe(pd.DataFrame(quarantined).astype(str), use_container_width=True, hide_index=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "📥 Download Quarantine Report (JSON)",
+                    json.dumps({"quarantine_report": True, "transactions": quarantined}, indent=2),
+                    "quarantine_report.json",
+                    "application/json"
+                )
+            with col2:
+                if st.button("🧹 Clear Quarantine"):
+                    storage.clear_quarantine(st.session_state.username)
+                    st.rerun()
+        
+        st.markdown("---")
+        
+        st.subheader("🔍 Duplicate Scan")
+        st.caption(f"Transactions of the same type, currency and description within "
+                   f"{dedup.DATE_WINDOW_DAYS} days and {dedup.AMOUNT_WINDOW_CENTS} cent of each other.")
+        
+        if st.button("🔍 Scan for Duplicates"):
+            st.session_state.duplicate_scan = dedup.scan_duplicates(
+                history_frame(st.session_state.manifest["partitions"])
+            )
+        
+        duplicates = st.session_state.duplicate_scan
+        if duplicates is not None:
+            if duplicates.empty:
+                st.success("No likely duplicates found")
+            else:
+                st.dataframe(duplicates, use_container_width=True, hide_index=True)
+                if st.button(f"🗑️ Delete {len(duplicates)} Flagged Duplicates"):
+                    flagged = set(duplicates['id'])
+                    load_partitions({storage.partition_key(day) for day in duplicates['date']})
+                    st.session_state.transactions = [
+                        t for t in st.session_state.transactions if t['id'] not in flagged
+                    ]
+                    save_data()
+                    st.session_state.duplicate_scan = None
+                    st.success(f"✅ Deleted {len(flagged)} duplicates")
+                    st.rerun()
+        
+        st.markdown("---")
+        
+        st.subheader("💱 Currency")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            new_reporting = st.selectbox(
+                "Reporting currency", fx.CURRENCIES,
+                index=fx.CURRENCIES.index(reporting) if reporting in fx.CURRENCIES else 0
+            )
+            if new_reporting != reporting:
+                # Budgets and goals are kept in the reporting currency, so they move with it
+                rate = fx.conversion_rate(reporting, new_reporting, cached_rates(fx.rates_version()))
+                if pd.isna(rate):
+                    st.error(f"❌ No FX rate between {reporting} and {new_reporting}, "
+                             "budgets and goals could not be converted.")
+                else:
+                    st.session_state.budgets = {
+                        category: round(amount * rate, 2) for category, amount in st.session_state.budgets.items()
+                    }
+                    for goal in st.session_state.goals:
+                        goal['target'] = round(goal['target'] * rate, 2)
+                        goal['current'] = round(goal['current'] * rate, 2)
+                    st.session_state.manifest["reporting_currency"] = new_reporting
+                    save_data()
+                    st.rerun()
+        
+        with col2:
+            rates = cached_rates(fx.rates_version())
+            if rates.empty:
+                st.info(f"No FX rates loaded. Add a `{fx.FX_RATES_FILE}` file with date, currency and rate "
+                        f"columns (value of one unit in {fx.BASE_CURRENCY}) to convert other currencies.")
+            else:
+                st.caption(f"{len(rates):,} rates for {', '.join(sorted(rates['currency'].unique()))} "
+                           f"up to {rates['date'].max():%Y-%m-%d}, loaded from `{fx.FX_RATES_FILE}`")
         
         st.markdown("---")
         
@@ -882,10 +1236,9 @@ else:
         if st.button("🗑️ Clear All Data", type="secondary"):
             confirm = st.checkbox("I understand this will delete all my data")
             if confirm:
-                st.session_state.transactions = []
                 st.session_state.budgets = {}
                 st.session_state.goals = []
-                save_data()
+                replace_all_transactions([])
                 st.success("All data cleared!")
                 st.rerun()
 
@@ -0,0 +1,192 @@
+"""Batch monthly statements for every account in users.json.
+
+Usage: python reports.py [--month YYYY-MM] [--out reports] [--workers N] [user ...]
+
+Users are spread over a process pool. Each worker reads one user's
+trailing year of partitions once and writes a self-contained HTML
+statement plus CSV files to <out>/<username>/.
+"""
+import argparse
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+import charts
+import fx
+import storage
+
+USERS_FILE = "users.json"
+REPORTS_DIR = "reports"
+# Months of history shown in the trend chart, ending with the statement month
+TREND_MONTHS = 12
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+# FX rates are loaded once per worker process by init_worker
+worker_rates = None
+
+
+def init_worker(rates):
+    global worker_rates
+    worker_rates = rates
+
+
+def previous_month(today=None):
+    """Key of the last complete month"""
+    return storage.shift_key(storage.partition_key(today or datetime.now()), -1)
+
+
+def month_argument(value):
+    """argparse type for a YYYY-MM month"""
+    if not MONTH_PATTERN.match(value) or not 1 <= int(value[5:]) <= 12:
+        raise argparse.ArgumentTypeError(f"month must be YYYY-MM, got {value!r}")
+    return value
+
+
+def load_usernames(path=USERS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return sorted(json.load(f))
+
+
+def read_manifest(username):
+    """Manifest of a user, without writing anything for users who have no data.
+
+    A legacy data file is migrated under the user's lock, like the app and
+    the ingestion endpoint do.
+    """
+    if os.path.exists(storage.manifest_file(username)):
+        return storage.load_manifest(username)
+    if not os.path.exists(storage.LEGACY_DATA_FILE_TEMPLATE.format(username=username)):
+        return storage.empty_manifest()
+    with storage.user_lock(username):
+        return storage.load_manifest(username)
+
+
+def statement(df, month, budgets, goals):
+    """Statement tables for one month of a converted transaction frame"""
+    month_df = df[df['month'] == month]
+    type_totals = month_df.groupby('type')['amount'].sum()
+    income, expenses = type_totals.get('Income', 0.0), type_totals.get('Expense', 0.0)
+    totals = pd.DataFrame({
+        "item": ["Income", "Expenses", "Net Savings", "Transactions"],
+        "value": [income, expenses, income - expenses, len(month_df)],
+    })
+
+    spending = month_df[month_df['type'] == 'Expense'].groupby('category')['amount'].agg(['sum', 'count'])
+    categories = pd.DataFrame({
+        "spent": spending['sum'],
+        "transactions": spending['count'],
+        # A budget of 0 means no budget was set
+        "budget": pd.Series(budgets, dtype=float).replace(0, float('nan')),
+    }).fillna({"spent": 0.0, "transactions": 0})
+    categories['transactions'] = categories['transactions'].astype(int)
+    categories['remaining'] = categories['budget'] - categories['spent']
+    categories['used_pct'] = (categories['spent'] / categories['budget'] * 100).round(1)
+    categories = categories.rename_axis('category').sort_values('spent', ascending=False).reset_index()
+
+    goals_df = pd.DataFrame(goals, columns=["name", "target", "current", "deadline"])
+    goals_df['progress_pct'] = (goals_df['current'] / goals_df['target'].replace(0, float('nan')) * 100).round(1)
+
+    return {"totals": totals, "categories": categories, "goals": goals_df, "transactions": month_df}
+
+
+def render_html(username, month, reporting, tables, figures):
+    """Self-contained HTML statement, plotly.js is inlined with the first chart"""
+    sections = []
+    include_js = True
+    for title, fig in figures:
+        if fig is None:
+            continue
+        sections.append(f"<h2>{title}</h2>" + fig.to_html(full_html=False, include_plotlyjs=include_js))
+        include_js = False
+    for title, key in (("Summary", "totals"), ("Budget Adherence", "categories"), ("Goal Progress", "goals")):
+        sections.append(f"<h2>{title}</h2>" + tables[key].to_html(index=False, float_format="{:,.2f}".format, na_rep=""))
+    body = "\n".join(sections)
+    username = html.escape(username)
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>{username} statement {month}</title>"
+            f"<style>body{{font-family:sans-serif;margin:2rem}}table{{border-collapse:collapse}}"
+            f"td,th{{border:1px solid #ddd;padding:4px 8px;text-align:right}}</style></head>"
+            f"<body><h1>💰 {username}: statement for {month}</h1>"
+            f"<p>Amounts in {reporting}</p>\n{body}</body></html>")
+
+
+def build_user_report(username, month, out_dir):
+    """Write one user's statement files and return their paths"""
+    manifest = read_manifest(username)
+    reporting = manifest.get("reporting_currency", fx.BASE_CURRENCY)
+    keys = {storage.shift_key(month, -i) for i in range(TREND_MONTHS)} & set(manifest["partitions"])
+
+    df = charts.prepare_frame(storage.partitions_frame(username, manifest, keys), worker_rates, reporting)
+    df['month'] = df['date'].dt.strftime('%Y-%m')
+    tables = statement(df, month, manifest.get("budgets", {}), manifest.get("goals", []))
+
+    month_df = tables["transactions"]
+    expense_totals = {row.category: {"amount": row.spent} for row in tables["categories"].itertuples() if row.spent > 0}
+    figures = [
+        ("Income vs Expenses", charts.income_expense_figure(month_df) if not month_df.empty else None),
+        ("Expense Breakdown", charts.expense_breakdown_figure(expense_totals)),
+        ("Monthly Trends", charts.monthly_trends_figure(df, reporting) if not df.empty else None),
+    ]
+
+    user_dir = os.path.join(out_dir, username)
+    os.makedirs(user_dir, exist_ok=True)
+    paths = {
+        "html": os.path.join(user_dir, f"statement_{month}.html"),
+        "transactions": os.path.join(user_dir, f"transactions_{month}.csv"),
+        "categories": os.path.join(user_dir, f"categories_{month}.csv"),
+        "goals": os.path.join(user_dir, f"goals_{month}.csv"),
+    }
+    storage.write_text(paths["html"], render_html(username, month, reporting, tables, figures))
+    transactions = month_df.assign(date=month_df['date'].dt.strftime('%Y-%m-%d'))
+    transactions = transactions.rename(columns={"amount": f"amount_{reporting}"}).drop(columns=['month'])
+    storage.write_text(paths["transactions"], transactions.sort_values('date').to_csv(index=False))
+    storage.write_text(paths["categories"], tables["categories"].to_csv(index=False))
+    storage.write_text(paths["goals"], tables["goals"].to_csv(index=False))
+    return paths
+
+
+def generate_reports(usernames, month, out_dir=REPORTS_DIR, workers=None):
+    """Build statements for many users in parallel, yielding (username, paths or error)"""
+    rates = fx.load_rates()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(rates,)) as executor:
+        futures = {executor.submit(build_user_report, username, month, out_dir): username
+                   for username in usernames}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate monthly statements for every user")
+    parser.add_argument("users", nargs="*", help=f"usernames, defaults to all users in {USERS_FILE}")
+    parser.add_argument("--month", type=month_argument, default=previous_month(), help="statement month as YYYY-MM")
+    parser.add_argument("--out", default=REPORTS_DIR, help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to CPU count")
+    args = parser.parse_args()
+
+    known = load_usernames()
+    unknown = sorted(set(args.users) - set(known))
+    if unknown:
+        parser.error(f"unknown users: {', '.join(unknown)}")
+    usernames = args.users or known
+    failed = 0
+    for done, (username, result) in enumerate(generate_reports(usernames, args.month, args.out, args.workers), 1):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"[{done}/{len(usernames)}] {username}: failed: {result}")
+        else:
+            print(f"[{done}/{len(usernames)}] {username}: {result['html']}")
+    print(f"Statements for {args.month}: {len(usernames) - failed} written, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
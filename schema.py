@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from fx import BASE_CURRENCY
+
+TRANSACTION_FIELDS = ["id", "date", "category", "amount", "type", "description", "currency"]
+TRANSACTION_TYPES = ["Expense", "Income"]
+CATEGORIES = ["Food", "Transport", "Housing", "Entertainment", "Utilities", "Healthcare",
+              "Shopping", "Salary", "Freelance", "Investment", "Other"]
+# Categories outside the vocabulary are filed here
+FALLBACK_CATEGORY = "Other"
+DATE_FORMAT = "%Y-%m-%d"
+CURRENCY_PATTERN = r"[A-Z]{3}"
+
+
+def per_unique(values, normalize):
+    """Apply a vectorized normalizer to the distinct values of a column only.
+
+    Dates, types, categories and currencies repeat heavily, so this turns
+    a million-row string operation into one over a few thousand values.
+    Missing values come back as NaN.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    normalized = np.asarray(normalize(pd.Series(uniques, dtype=object)), dtype=object)
+    return pd.Series(np.append(normalized, np.nan)[codes], index=values.index, dtype=object)
+
+
+def category_lookup(uniques):
+    canonical = {category.lower(): category for category in CATEGORIES}
+    return uniques.astype(str).str.strip().str.lower().map(canonical)
+
+
+REJECT_REASONS = ["", "invalid date", "invalid amount", "invalid type", "invalid currency"]
+
+
+def columns_of(transactions):
+    """Object columns of transaction dicts or a DataFrame, one per field"""
+    if isinstance(transactions, pd.DataFrame):
+        frame = transactions.reindex(columns=TRANSACTION_FIELDS)
+        return {field: pd.Series(frame[field].to_numpy(dtype=object), dtype=object) for field in TRANSACTION_FIELDS}
+    return {
+        field: pd.Series(np.fromiter([t.get(field) for t in transactions], dtype=object,
+                                     count=len(transactions)), dtype=object)
+        for field in TRANSACTION_FIELDS
+    }
+
+
+def validate(transactions, taken_ids=(), next_id=1):
+    """Check and coerce transactions column by column.
+
+    Rows with an unparseable date, a non-positive or non-numeric amount,
+    an unknown type or a malformed currency are rejected. Categories are
+    matched case-insensitively and unknown ones become FALLBACK_CATEGORY.
+    Missing, malformed and duplicate ids (within the rows or against the
+    taken_ids array) are replaced by ids above every id seen, starting at
+    next_id or later.
+
+    Returns the clean transaction dicts, the rejected rows as given with
+    a reason, and counts of the fixes that were applied.
+    """
+    columns = columns_of(transactions)
+    size = len(columns['id'])
+    reasons = np.zeros(size, dtype=np.int8)
+
+    def reject(mask, reason):
+        reasons[np.asarray(mask) & (reasons == 0)] = REJECT_REASONS.index(reason)
+
+    dates = per_unique(columns['date'], lambda uniques: pd.to_datetime(
+        uniques.astype(str), format=DATE_FORMAT, errors='coerce').dt.strftime(DATE_FORMAT))
+    reject(dates.isna(), "invalid date")
+
+    amounts = pd.to_numeric(columns['amount'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    reject(~np.isfinite(amounts) | (amounts <= 0), "invalid amount")
+
+    types = per_unique(columns['type'], lambda uniques: uniques.astype(str).str.strip().str.capitalize()
+                       .where(lambda value: value.isin(TRANSACTION_TYPES)))
+    reject(types.isna(), "invalid type")
+
+    currencies = per_unique(columns['currency'].fillna(BASE_CURRENCY), lambda uniques: uniques.astype(str)
+                            .str.strip().str.upper().where(lambda value: value.str.fullmatch(CURRENCY_PATTERN)))
+    reject(currencies.isna(), "invalid currency")
+
+    categories = per_unique(columns['category'], category_lookup)
+    unknown_categories = categories.isna().to_numpy()
+    categories = categories.fillna(FALLBACK_CATEGORY)
+
+    descriptions = columns['description']
+    not_text = ~descriptions.map(type, na_action=None).eq(str).to_numpy()
+    if not_text.any():
+        descriptions = descriptions.where(~not_text, descriptions.fillna("").astype(str))
+
+    kept = reasons == 0
+    raw_ids = pd.to_numeric(columns['id'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid_ids = kept & (raw_ids > 0) & (raw_ids % 1 == 0)
+    ids = np.where(valid_ids, np.nan_to_num(raw_ids, nan=-1), -1).astype(np.int64)
+    taken = np.asarray(taken_ids, dtype=np.int64)
+    duplicated = pd.Series(ids).duplicated().to_numpy() | np.isin(ids, taken)
+    renumber = kept & ((ids < 0) | duplicated)
+    first_new = max(next_id, ids.max(initial=0) + 1, taken.max(initial=0) + 1)
+    ids[renumber] = np.arange(first_new, first_new + renumber.sum())
+
+    clean = {"id": ids, "date": dates, "category": categories, "amount": amounts,
+             "type": types, "description": descriptions, "currency": currencies}
+    values = [np.asarray(clean[field])[kept].tolist() for field in TRANSACTION_FIELDS]
+    # A dict display is about twice as fast as dict(zip(...)) per row
+    records = [
+        {"id": i, "date": d, "category": c, "amount": a, "type": t, "description": s, "currency": u}
+        for i, d, c, a, t, s, u in zip(*values)
+    ]
+
+    rejected = [
+        {**{field: columns[field].iat[row] for field in TRANSACTION_FIELDS}, "reason": REJECT_REASONS[reasons[row]]}
+        for row in np.flatnonzero(~kept)
+    ]
+    fixes = {
+        "unknown category": int((unknown_categories & kept).sum()),
+        "new id": int(renumber.sum()),
+    }
+    return records, rejected, {fix: count for fix, count in fixes.items() if count}
@@ -0,0 +1,659 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows locks a byte range of the lock file instead
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+import schema
+from fx import BASE_CURRENCY
+from schema import TRANSACTION_FIELDS
+
+# Partitioned per-user storage layout:
+#   data_<username>/manifest.json          budgets, goals and per-month summaries
+#   data_<username>/transactions/YYYY-MM.json
+#   data_<username>/transactions/YYYY-MM.log  upserts and deletes appended since the .json was written
+#   data_<username>/snapshot.json          layout of the current binary snapshot
+#   data_<username>/snapshot/<generation>/ memory-mappable .npy columns
+#   data_<username>/revision               changes whenever transactions or settings are saved
+#   data_<username>/lock                   held by every writer of partitions and the manifest
+#   data_<username>/quarantine.json        rows rejected by schema validation
+DATA_DIR_TEMPLATE = "data_{username}"
+LEGACY_DATA_FILE_TEMPLATE = "data_{username}.json"
+HOT_MONTHS = 3
+# A partition log is folded into its .json file once it outgrows both
+COMPACT_MIN_BYTES = 1 << 20
+SNAPSHOT_COLUMNS = ["ids", "dates", "amounts", "type_codes", "category_codes", "currency_codes",
+                    "description_offsets", "description_bytes"]
+
+
+def user_data_dir(username):
+    return DATA_DIR_TEMPLATE.format(username=username)
+
+
+def manifest_file(username):
+    return os.path.join(user_data_dir(username), "manifest.json")
+
+
+def partition_file(username, key):
+    return os.path.join(user_data_dir(username), "transactions", f"{key}.json")
+
+
+def partition_log_file(username, key):
+    return os.path.join(user_data_dir(username), "transactions", f"{key}.log")
+
+
+def snapshot_file(username):
+    return os.path.join(user_data_dir(username), "snapshot.json")
+
+
+def snapshot_dir(username, generation):
+    return os.path.join(user_data_dir(username), "snapshot", generation)
+
+
+def new_generation():
+    """Snapshot generation name that sorts by creation time"""
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+
+
+def generation_order(generation):
+    """Creation time of a generation, generations without one sort first"""
+    created = generation.split("-")[0]
+    return int(created) if "-" in generation and created.isdigit() else -1
+
+
+def quarantine_file(username):
+    return os.path.join(user_data_dir(username), "quarantine.json")
+
+
+def revision_file(username):
+    return os.path.join(user_data_dir(username), "revision")
+
+
+def lock_file(username):
+    return os.path.join(user_data_dir(username), "lock")
+
+
+def partition_key(date):
+    """Partition key (YYYY-MM) for a YYYY-MM-DD date string or date object"""
+    if isinstance(date, str):
+        return date[:7]
+    return date.strftime("%Y-%m")
+
+
+def shift_key(key, months):
+    """Move a YYYY-MM key by a number of months"""
+    year, month = int(key[:4]), int(key[5:7])
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def write_text(path, text):
+    """Write a file atomically so readers never see a half-written file"""
+    # A unique temporary name keeps concurrent writers from clobbering each other
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data, indent=2):
+    write_text(path, json.dumps(data, indent=indent))
+
+
+def digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def empty_manifest():
+    return {"budgets": {}, "goals": [], "partitions": {}}
+
+
+def summarize(transactions):
+    """Summarize one partition: counts and sums by type and category"""
+    summary = {"count": 0, "max_id": 0, "totals": {}, "categories": {}, "currencies": []}
+    for t in transactions:
+        add_to_summary(summary, t)
+    return summary
+
+
+def add_to_summary(summary, t):
+    summary["count"] += 1
+    if t['currency'] not in summary["currencies"]:
+        summary["currencies"].append(t['currency'])
+    summary["max_id"] = max(summary["max_id"], t['id'])
+    summary["totals"][t['type']] = summary["totals"].get(t['type'], 0) + t['amount']
+    by_category = summary["categories"].setdefault(t['type'], {})
+    entry = by_category.setdefault(t['category'], {"amount": 0, "count": 0})
+    entry["amount"] += t['amount']
+    entry["count"] += 1
+
+
+def normalize(transactions):
+    """Fill in fields added after a transaction was stored"""
+    for t in transactions:
+        t.setdefault('currency', BASE_CURRENCY)
+    return transactions
+
+
+def group_by_partition(transactions):
+    partitions = {}
+    for t in transactions:
+        partitions.setdefault(partition_key(t['date']), []).append(t)
+    return partitions
+
+
+def load_manifest(username):
+    """Load a user's manifest, migrating the legacy single-file layout"""
+    path = manifest_file(username)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    manifest = empty_manifest()
+    transactions = []
+    legacy_file = LEGACY_DATA_FILE_TEMPLATE.format(username=username)
+    if os.path.exists(legacy_file):
+        with open(legacy_file, 'r') as f:
+            data = json.load(f)
+        manifest["budgets"] = data.get('budgets', {})
+        manifest["goals"] = data.get('goals', [])
+        transactions, rejected, _ = schema.validate(data.get('transactions', []))
+        quarantine(username, rejected, os.path.basename(legacy_file))
+    replace_transactions(username, manifest, transactions)
+    return manifest
+
+
+def save_manifest(username, manifest):
+    os.makedirs(user_data_dir(username), exist_ok=True)
+    write_json(manifest_file(username), manifest)
+
+
+def load_partition(username, key):
+    path = partition_file(username, key)
+    rows = []
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            rows = json.load(f)
+    log_path = partition_log_file(username, key)
+    if os.path.exists(log_path):
+        with open(log_path, 'r') as f:
+            # The last line is empty, or partly written by an append in progress
+            lines = f.read().split("\n")[:-1]
+        rows = apply_entries(rows, [json.loads(line) for line in lines])
+    return normalize(rows)
+
+
+def apply_entries(rows, entries):
+    """Rows after a list of {"upsert": transaction} and {"delete": id} entries"""
+    by_id = {t['id']: t for t in rows}
+    for entry in entries:
+        if "upsert" in entry:
+            by_id[entry["upsert"]['id']] = entry["upsert"]
+        else:
+            by_id.pop(entry["delete"], None)
+    return list(by_id.values())
+
+
+def load_partitions(username, manifest, keys):
+    """Load partitions as transaction dicts, from the snapshot where fresh"""
+    snapshot = open_snapshot(username)
+    fresh = [key for key in sorted(keys) if is_fresh(snapshot, manifest, key)]
+    transactions = snapshot_records(snapshot, fresh) if fresh else []
+    for key in sorted(keys):
+        if key not in fresh:
+            transactions.extend(load_partition(username, key))
+    return transactions
+
+
+def partitions_frame(username, manifest, keys):
+    """Load partitions as a DataFrame, reading fresh ones from the snapshot"""
+    snapshot = open_snapshot(username)
+    fresh = [key for key in sorted(keys) if is_fresh(snapshot, manifest, key)]
+    stale = [key for key in sorted(keys) if key not in fresh]
+    frames = [snapshot_frame(snapshot, fresh)] if fresh else []
+    for key in stale:
+        frames.append(pd.DataFrame(load_partition(username, key), columns=TRANSACTION_FIELDS))
+    if not frames:
+        return pd.DataFrame(columns=TRANSACTION_FIELDS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def save_partitions(username, manifest, transactions, keys):
+    """Rewrite the given partitions from transactions and update the manifest.
+
+    Partitions in keys that no longer hold any transaction are removed.
+    Partitions outside keys are left untouched. Returns the keys whose
+    contents changed.
+    """
+    os.makedirs(os.path.join(user_data_dir(username), "transactions"), exist_ok=True)
+    grouped = group_by_partition(t for t in transactions if partition_key(t['date']) in keys)
+    changed = set()
+    for key in keys:
+        rows = grouped.get(key)
+        if rows:
+            text = json.dumps(rows)
+            text_digest = digest(text)
+            # Unchanged partitions are not rewritten
+            if manifest["partitions"].get(key, {}).get("digest") == text_digest:
+                manifest["partitions"][key]["validated"] = True
+                continue
+            # Every caller passes rows that went through schema validation
+            write_partition(username, manifest, key, rows, text, validated=True)
+            changed.add(key)
+        elif key in manifest["partitions"]:
+            remove_partition(username, manifest, key)
+            changed.add(key)
+    save_manifest(username, manifest)
+    return changed
+
+
+def write_partition(username, manifest, key, rows, text, validated):
+    """Write a partition file from its rows and fold away its log"""
+    write_text(partition_file(username, key), text)
+    # The file now holds everything the log added, replaying it again is harmless
+    if os.path.exists(partition_log_file(username, key)):
+        os.remove(partition_log_file(username, key))
+    manifest["partitions"][key] = summarize(rows)
+    manifest["partitions"][key]["digest"] = digest(text)
+    manifest["partitions"][key]["validated"] = validated
+
+
+def remove_partition(username, manifest, key):
+    manifest["partitions"].pop(key, None)
+    for path in (partition_file(username, key), partition_log_file(username, key)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def append_partition(username, manifest, key, entries, rows=None):
+    """Append upserts and deletes to a partition's log instead of rewriting it.
+
+    rows are the partition's transactions after the entries, if the caller
+    has them. Without rows the entries may only insert new transactions,
+    and the summary is extended with them. The digest is chained from the
+    previous one. The log is folded into the partition file once it
+    outgrows it, so appends stay proportional to the new entries. The
+    manifest is not saved.
+    """
+    if rows is not None and not rows:
+        remove_partition(username, manifest, key)
+        return
+    os.makedirs(os.path.join(user_data_dir(username), "transactions"), exist_ok=True)
+    summary = manifest["partitions"].get(key)
+    if summary is None:
+        # Callers append validated rows only
+        summary = manifest["partitions"][key] = dict(summarize([]), digest=None, validated=True)
+    log_bytes = summary.get("log_bytes", 0)
+    text = "".join(json.dumps(entry) + "\n" for entry in entries)
+    log_path = partition_log_file(username, key)
+    with open(log_path, 'a') as f:
+        # Drop a tail whose append never reached the manifest
+        if os.path.getsize(log_path) > log_bytes:
+            f.truncate(log_bytes)
+        f.write(text)
+    if rows is None:
+        for entry in entries:
+            add_to_summary(summary, entry["upsert"])
+    else:
+        summary.update(summarize(rows))
+    summary["digest"] = digest((summary["digest"] or "") + text)
+    summary["log_bytes"] = log_bytes + len(text)
+
+    path = partition_file(username, key)
+    if summary["log_bytes"] > max(os.path.getsize(path) if os.path.exists(path) else 0, COMPACT_MIN_BYTES):
+        rows = rows if rows is not None else load_partition(username, key)
+        write_partition(username, manifest, key, rows, json.dumps(rows), summary["validated"])
+
+
+def quarantine(username, rejected, source):
+    """Append rejected rows to the user's quarantine report"""
+    if not rejected:
+        return
+    entries = load_quarantine(username)
+    entries.extend(dict(row, source=source) for row in rejected)
+    os.makedirs(user_data_dir(username), exist_ok=True)
+    write_json(quarantine_file(username), entries)
+
+
+def load_quarantine(username):
+    path = quarantine_file(username)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def clear_quarantine(username):
+    if os.path.exists(quarantine_file(username)):
+        os.remove(quarantine_file(username))
+
+
+def validate_partitions(username, manifest, keys):
+    """Validate stored partitions written before validation, in one pass.
+
+    Clean rows are written back, which marks the partitions validated so
+    later loads skip them. Rejected rows go to the quarantine report.
+    """
+    keys = set(keys)
+    rows = []
+    for key in sorted(keys):
+        rows.extend(load_partition(username, key))
+    others = partitions_frame(username, manifest, set(manifest["partitions"]) - keys)
+    clean, rejected, _ = schema.validate(
+        rows, taken_ids=others['id'].to_numpy(dtype=np.int64), next_id=next_transaction_id(manifest)
+    )
+    quarantine(username, rejected, "stored transactions")
+    # Rows whose date belongs to another stored month keep that month's rows
+    extra = {partition_key(t['date']) for t in clean} - keys
+    clean.extend(load_partitions(username, manifest, extra & set(manifest["partitions"])))
+    save_partitions(username, manifest, clean, keys | extra)
+
+
+@contextmanager
+def user_lock(username):
+    """Hold the user's write lock, shared by app sessions and the ingestion endpoint.
+
+    Writers load the manifest, check the revision and save inside the
+    lock, so no writer saves over partitions another one just wrote.
+    """
+    os.makedirs(user_data_dir(username), exist_ok=True)
+    with open(lock_file(username), 'a') as f:
+        lock_handle(f, True)
+        try:
+            yield
+        finally:
+            lock_handle(f, False)
+
+
+def lock_handle(f, locked):
+    """Take or release an exclusive lock on an open file, blocking until it is free"""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX if locked else fcntl.LOCK_UN)
+        return
+    os.lseek(f.fileno(), 0, os.SEEK_SET)
+    if not locked:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    while True:
+        try:
+            # LK_LOCK gives up after ten one-second retries
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def mark_changed(username):
+    """Record a write so other sessions reload, returns the new revision"""
+    marker = uuid.uuid4().hex
+    write_text(revision_file(username), marker)
+    return marker
+
+
+def revision(username):
+    """Current change marker of a user, or None if never written"""
+    try:
+        with open(revision_file(username), 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def replace_transactions(username, manifest, transactions):
+    """Replace a user's whole transaction history"""
+    normalize(transactions)
+    keys = set(manifest["partitions"]) | set(group_by_partition(transactions))
+    return save_partitions(username, manifest, transactions, keys)
+
+
+def read_all_transactions(username, manifest):
+    return load_partitions(username, manifest, manifest["partitions"])
+
+
+def hot_partition_keys(manifest, months=HOT_MONTHS):
+    """Keys of the most recent months of activity, loaded at login"""
+    if not manifest["partitions"]:
+        return set()
+    cutoff = shift_key(max(manifest["partitions"]), -(months - 1))
+    return {key for key in manifest["partitions"] if key >= cutoff}
+
+
+def partitions_in_range(manifest, start, end):
+    """Keys of stored partitions overlapping a date range"""
+    start_key, end_key = partition_key(start), partition_key(end)
+    return {key for key in manifest["partitions"] if start_key <= key <= end_key}
+
+
+def next_transaction_id(manifest):
+    return max((p["max_id"] for p in manifest["partitions"].values()), default=0) + 1
+
+
+def type_totals(manifest):
+    """Total amount per transaction type across all partitions"""
+    totals = {}
+    for summary in manifest["partitions"].values():
+        for trans_type, amount in summary["totals"].items():
+            totals[trans_type] = totals.get(trans_type, 0) + amount
+    return totals
+
+
+def category_totals(manifest, trans_type):
+    """Total amount and count per category of one type across all partitions"""
+    totals = {}
+    for summary in manifest["partitions"].values():
+        for category, entry in summary["categories"].get(trans_type, {}).items():
+            total = totals.setdefault(category, {"amount": 0, "count": 0})
+            total["amount"] += entry["amount"]
+            total["count"] += entry["count"]
+    return totals
+
+
+def currencies(manifest):
+    """Currencies used anywhere in the stored history"""
+    used = set()
+    for summary in manifest["partitions"].values():
+        used.update(summary.get("currencies", [BASE_CURRENCY]))
+    return used
+
+
+def monthly_totals(manifest):
+    """Per-month totals by type, keyed by YYYY-MM"""
+    return {key: dict(summary["totals"]) for key, summary in manifest["partitions"].items()}
+
+
+def open_snapshot(username):
+    """Open the current snapshot with memory-mapped columns, or None"""
+    path = snapshot_file(username)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        snapshot = json.load(f)
+    directory = snapshot_dir(username, snapshot["generation"])
+    try:
+        for column in SNAPSHOT_COLUMNS:
+            snapshot[column] = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode='r')
+    except FileNotFoundError:
+        return None
+    return snapshot
+
+
+def is_fresh(snapshot, manifest, key):
+    """Whether the snapshot holds the current contents of a partition"""
+    if snapshot is None or key not in snapshot["partitions"]:
+        return False
+    return snapshot["partitions"][key]["digest"] == manifest["partitions"].get(key, {}).get("digest")
+
+
+def snapshot_columns(snapshot, keys):
+    """Column arrays of the given snapshot partitions.
+
+    Rows are gathered with one index array, so every column is a copy of
+    the selected rows. The description blob is decoded once for all rows.
+    """
+    slices = [snapshot["partitions"][key] for key in sorted(keys)]
+    index = np.concatenate(
+        [np.arange(s["start"], s["stop"], dtype=np.int64) for s in slices]
+    ) if slices else np.zeros(0, dtype=np.int64)
+    offsets = snapshot["description_offsets"]
+    starts = offsets[index].tolist()
+    stops = offsets[index + 1].tolist()
+    # Decode the description blob once and slice it, falling back to per-row
+    # decoding when multi-byte characters make byte and character offsets differ
+    low = min(starts, default=0)
+    blob = snapshot["description_bytes"][low:max(stops, default=0)].tobytes()
+    text = blob.decode('utf-8')
+    if len(text) == len(blob):
+        descriptions = [text[a - low:b - low] for a, b in zip(starts, stops)]
+    else:
+        descriptions = [blob[a - low:b - low].decode('utf-8') for a, b in zip(starts, stops)]
+    return {
+        "id": snapshot["ids"][index],
+        "date": np.datetime_as_string(snapshot["dates"][index], unit='D'),
+        "category": np.asarray(snapshot["categories"], dtype=object)[snapshot["category_codes"][index]],
+        "amount": snapshot["amounts"][index],
+        "type": np.asarray(snapshot["types"], dtype=object)[snapshot["type_codes"][index]],
+        "description": descriptions,
+        "currency": np.asarray(snapshot["currencies"], dtype=object)[snapshot["currency_codes"][index]],
+    }
+
+
+def snapshot_frame(snapshot, keys):
+    return pd.DataFrame(snapshot_columns(snapshot, keys), columns=TRANSACTION_FIELDS)
+
+
+def snapshot_records(snapshot, keys):
+    """Transaction dicts of the given snapshot partitions"""
+    columns = snapshot_columns(snapshot, keys)
+    values = [columns[field] if isinstance(columns[field], list) else columns[field].tolist()
+              for field in TRANSACTION_FIELDS]
+    return [dict(zip(TRANSACTION_FIELDS, row)) for row in zip(*values)]
+
+
+def encode_rows(rows, categories, types, currency_vocab):
+    """Column arrays for a list of transactions, extending the vocabularies"""
+    normalize(rows)
+    for t in rows:
+        if t['category'] not in categories:
+            categories.append(t['category'])
+        if t['type'] not in types:
+            types.append(t['type'])
+        if t['currency'] not in currency_vocab:
+            currency_vocab.append(t['currency'])
+    category_index = {c: i for i, c in enumerate(categories)}
+    type_index = {t: i for i, t in enumerate(types)}
+    currency_index = {c: i for i, c in enumerate(currency_vocab)}
+    encoded = [t['description'].encode('utf-8') for t in rows]
+    return {
+        "ids": np.array([t['id'] for t in rows], dtype=np.int64),
+        "dates": np.array([t['date'] for t in rows], dtype='datetime64[D]'),
+        "amounts": np.array([t['amount'] for t in rows], dtype=np.float64),
+        "type_codes": np.array([type_index[t['type']] for t in rows], dtype=np.int8),
+        "category_codes": np.array([category_index[t['category']] for t in rows], dtype=np.int16),
+        "currency_codes": np.array([currency_index[t['currency']] for t in rows], dtype=np.int16),
+        "description_lengths": np.array([len(b) for b in encoded], dtype=np.int64),
+        "description_bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+def refresh_snapshot(username, manifest):
+    """Rebuild the snapshot for partitions that changed since it was written.
+
+    Partitions not yet validated are checked first. Fresh partitions are
+    copied from the current snapshot, only stale ones are parsed from JSON.
+    Returns the opened snapshot.
+    """
+    unchecked = [key for key, summary in manifest["partitions"].items() if not summary.get("validated")]
+    if unchecked:
+        validate_partitions(username, manifest, unchecked)
+    snapshot = open_snapshot(username)
+    keys = sorted(manifest["partitions"])
+    stale = [key for key in keys if not is_fresh(snapshot, manifest, key)]
+    # Months that only gained log entries are read from their files until
+    # they are compacted, so a stream of appends does not rebuild the snapshot
+    if snapshot is not None and set(snapshot["partitions"]) <= set(keys) and \
+            all(manifest["partitions"][key].get("log_bytes") for key in stale):
+        return snapshot
+
+    categories = list(snapshot["categories"]) if snapshot else []
+    types = list(snapshot["types"]) if snapshot else []
+    currency_vocab = list(snapshot["currencies"]) if snapshot else []
+    pieces, layout, start = [], {}, 0
+    for key in keys:
+        if is_fresh(snapshot, manifest, key):
+            part = snapshot["partitions"][key]
+            rows = slice(part["start"], part["stop"])
+            offsets = snapshot["description_offsets"]
+            piece = {column: snapshot[column][rows] for column in
+                     ["ids", "dates", "amounts", "type_codes", "category_codes", "currency_codes"]}
+            piece["description_lengths"] = np.diff(offsets[part["start"]:part["stop"] + 1])
+            piece["description_bytes"] = snapshot["description_bytes"][offsets[part["start"]]:offsets[part["stop"]]]
+            key_digest = part["digest"]
+        elif manifest["partitions"][key].get("log_bytes"):
+            # Appended rows are replayed over the partition file
+            piece = encode_rows(load_partition(username, key), categories, types, currency_vocab)
+            key_digest = manifest["partitions"][key]["digest"]
+        else:
+            with open(partition_file(username, key), 'r') as f:
+                text = f.read()
+            piece = encode_rows(json.loads(text), categories, types, currency_vocab)
+            key_digest = digest(text)
+            # Partitions written before digests were tracked get one now
+            manifest["partitions"][key]["digest"] = key_digest
+        stop = start + len(piece["ids"])
+        layout[key] = {"start": start, "stop": stop, "digest": key_digest}
+        pieces.append(piece)
+        start = stop
+
+    def combine(column, dtype):
+        arrays = [piece[column] for piece in pieces]
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    columns = {
+        "ids": combine("ids", np.int64),
+        "dates": combine("dates", 'datetime64[D]'),
+        "amounts": combine("amounts", np.float64),
+        "type_codes": combine("type_codes", np.int8),
+        "category_codes": combine("category_codes", np.int16),
+        "currency_codes": combine("currency_codes", np.int16),
+        "description_bytes": combine("description_bytes", np.uint8),
+    }
+    columns["description_offsets"] = np.concatenate(
+        [[0], np.cumsum(combine("description_lengths", np.int64))]
+    ).astype(np.int64)
+
+    previous = None
+    if os.path.exists(snapshot_file(username)):
+        with open(snapshot_file(username), 'r') as f:
+            previous = json.load(f)["generation"]
+    generation = new_generation()
+    directory = snapshot_dir(username, generation)
+    os.makedirs(directory)
+    for column in SNAPSHOT_COLUMNS:
+        np.save(os.path.join(directory, f"{column}.npy"), columns[column])
+    write_json(snapshot_file(username), {
+        "generation": generation,
+        "categories": categories,
+        "types": types,
+        "currencies": currency_vocab,
+        "partitions": layout,
+    })
+    save_manifest(username, manifest)
+    # Only generations older than the one replaced here are removed. Another
+    # process may have written a newer one meanwhile, and processes still
+    # mapping a removed generation keep their open files.
+    if previous is not None:
+        for old in os.listdir(os.path.dirname(directory)):
+            if generation_order(old) < generation_order(previous):
+                shutil.rmtree(os.path.join(os.path.dirname(directory), old), ignore_errors=True)
+    return open_snapshot(username)